@@ -0,0 +1,115 @@
+"""
+Benchmark of the stacked-bar label placement in the history energy graph, comparing
+`energyhub.history.spread_labels` with the adjust_text call it replaced.
+
+Run from the repository root with::
+
+    python -m benchmarks.bar_labels [--days N]
+
+adjustText is only needed for the comparison, and is no longer an app requirement.
+Each synthetic day gets random energies, so label crowding varies from day to day.
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+from adjustText import adjust_text
+
+from energyhub.history import EnergyGraph, CONSUMER_COLORS, SOURCES
+
+
+def synthetic_history(rng: random.Random) -> Dict:
+    def energy(scale=2000):
+        # plenty of small values, so that labels crowd together at the bottom of the bars
+        return rng.choice((0., rng.uniform(0, 300), rng.uniform(0, scale)))
+
+    consumer_energies = tuple(energy() for _ in CONSUMER_COLORS)
+    solar_consumption = rng.uniform(500, 8000)
+    battery_solar_charging = energy()
+    export = energy(5000)
+    battery_discharge = energy()
+    purchased = energy(5000)
+    return {'sources': SOURCES,
+            'consumer_energies': consumer_energies,
+            'solar_consumption_energy': solar_consumption,
+            'battery_solar_charging_energy': battery_solar_charging,
+            'export_energy': export,
+            'battery_discharge_energy': battery_discharge,
+            'import_energy': purchased,
+            'production_energy': solar_consumption + battery_solar_charging + export,
+            'total_consumption': max(sum(consumer_energies), solar_consumption + battery_discharge + purchased),
+            }
+
+
+def legacy_place_labels(graph: EnergyGraph):
+    for bar in graph.bars:
+        labels = [label for label in bar.labels if label.get_visible()]
+        for i, label in enumerate(bar.labels):
+            label.set_position((0.6, bar._label_centres[i]))
+        adjust_text(labels, only_move={'text': 'y'}, autoalign=False, text_from_points=False,
+                    save_steps=False, ha='left', ax=bar.axes)
+
+
+def place_labels(graph: EnergyGraph):
+    for bar in graph.bars:
+        bar.place_labels()
+
+
+def label_positions(graph: EnergyGraph) -> List[float]:
+    return [label.get_position()[1] for bar in graph.bars for label in bar.labels if label.get_visible()]
+
+
+def count_overlaps(graph: EnergyGraph) -> int:
+    renderer = graph.figure.canvas.get_renderer()
+    overlaps = 0
+    for bar in graph.bars:
+        boxes = [label.get_window_extent(renderer) for label in bar.labels if label.get_visible()]
+        overlaps += sum(a.overlaps(b) for i, a in enumerate(boxes) for b in boxes[i + 1:])
+    return overlaps
+
+
+def time_placement(place, graph: EnergyGraph, histories: List[Dict]) -> (float, int):
+    elapsed = 0.
+    overlaps = 0
+    for history in histories:
+        graph.update(history)
+        graph._layout()
+        start = time.perf_counter()
+        place(graph)
+        elapsed += time.perf_counter() - start
+        overlaps += count_overlaps(graph)
+    return elapsed, overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=50, help='number of synthetic days')
+    parser.add_argument('--width', type=int, default=1440, help='graph width in pixels')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    histories = [synthetic_history(rng) for _ in range(args.days)]
+    graph = EnergyGraph((args.width, args.width // 2))
+
+    # identical input gives identical output
+    graph.update(histories[0])
+    graph._layout()
+    place_labels(graph)
+    first = label_positions(graph)
+    place_labels(graph)
+    assert np.array_equal(first, label_positions(graph))
+
+    legacy_time, legacy_overlaps = time_placement(legacy_place_labels, graph, histories)
+    new_time, new_overlaps = time_placement(place_labels, graph, histories)
+    print(f'{args.days} days, three labelled bars per day')
+    print(f'adjust_text:   {legacy_time:.3f} s ({1000 * legacy_time / args.days:.2f} ms/day), '
+          f'{legacy_overlaps} overlapping label pairs')
+    print(f'spread_labels: {new_time:.3f} s ({1000 * new_time / args.days:.2f} ms/day), '
+          f'{new_overlaps} overlapping label pairs')
+    print(f'speed-up:      {legacy_time / new_time:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
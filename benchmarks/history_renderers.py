@@ -0,0 +1,96 @@
+"""
+Benchmark of the two ways of drawing the history time-series graphs: matplotlib (Agg, then a texture
+upload) and `energyhub.mesh_graph.MeshGraph` (Kivy Mesh and Line instructions).
+
+Run from the repository root, on a machine with a display, with::
+
+    python -m benchmarks.history_renderers [--days N] [--points N] [--width PX]
+
+For each graph kind it reports the time spent away from the main thread (updating the data, and
+rasterising for matplotlib), the time on the main thread to show the result, and the cost of
+zooming into the morning, which matplotlib has to re-render but MeshGraph does with a matrix.
+The app's choice is made per graph with ``history: {mesh-graphs: [...]}`` in site_config.yml.
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import numpy as np
+from kivy.core.window import Window  # noqa: F401, creates the GL context that textures need
+
+from energyhub.history import FigureImage, MESH_KINDS, SOURCES, STACK_GRAPHS, history_graph, history_widget
+
+
+def synthetic_history(rng: np.random.Generator, n_points: int) -> Dict:
+    def power():
+        return rng.uniform(0, 2000, n_points) * (rng.random(n_points) > 0.3)
+
+    return {'sources': SOURCES,
+            'hours': np.linspace(0, 24, n_points, endpoint=False),
+            'consumer_powers': tuple(power() for _ in STACK_GRAPHS['consumers']['colors']),
+            'solar_consumption': power(),
+            'battery_discharging': power(),
+            'import_power': power(),
+            'battery_solar_charging': power(),
+            'export_power': power(),
+            'battery_state': np.clip(np.cumsum(rng.normal(0, 2, n_points)) + 50, 0, 100),
+            }
+
+
+def time_renderer(graph, widget, histories: List[Dict], zoom) -> Dict[str, float]:
+    timings = defaultdict(float)
+    for history in histories:
+        start = time.perf_counter()
+        graph.update(history)
+        frame = graph.render()
+        middle = time.perf_counter()
+        widget.show(frame)
+        end = time.perf_counter()
+        zoom(graph, widget)
+        timings['worker'] += middle - start
+        timings['main'] += end - middle
+        timings['zoom'] += time.perf_counter() - end
+    return {name: 1000 * total / len(histories) for name, total in timings.items()}
+
+
+def zoom_matplotlib(graph, widget: FigureImage):
+    graph.ax.set_xlim(6, 12)
+    widget.show(graph.render())
+    graph.ax.set_xlim(0, 24)
+
+
+def zoom_mesh(_, widget):
+    widget.x_range = [6., 12.]
+    widget.x_range = [0., 24.]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=20, help='number of synthetic days')
+    parser.add_argument('--points', type=int, default=288, help='samples per day')
+    parser.add_argument('--width', type=int, default=1440, help='graph width in pixels')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    histories = [synthetic_history(rng, args.points) for _ in range(args.days)]
+    size = (args.width, args.width // 2)
+    print(f'{args.days} days of {args.points} points, at {size[0]}x{size[1]}, in ms per day')
+    print(f'{"graph":<10} {"renderer":<11} {"worker":>8} {"main":>8} {"zoom":>8}')
+    for kind in MESH_KINDS:
+        figure_image = FigureImage(size_hint=(None, None), size=size)
+        mesh_graph = history_widget(kind, mesh=True)
+        mesh_graph.size_hint = (None, None)
+        mesh_graph.size = size
+        renderers = (('matplotlib', history_graph(kind, size), figure_image, zoom_matplotlib),
+                     ('mesh', history_graph(kind, size, mesh=True), mesh_graph, zoom_mesh))
+        for renderer, graph, widget, zoom in renderers:
+            timings = time_renderer(graph, widget, histories, zoom)
+            print(f'{kind:<10} {renderer:<11} {timings["worker"]:8.2f} {timings["main"]:8.2f} {timings["zoom"]:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of how long the main thread stalls while the history of a day is loaded, with the graphs
+rendered on the worker thread (the default) or on the main thread (``ENERGYHUB_RENDER_ON_MAIN_THREAD``).
+
+Run from the repository root with::
+
+    python -m benchmarks.history_stalls [--days N] [--width PX]
+
+Each synthetic day is loaded into a `HistoryView`, with its sources arriving a frame apart as they
+would from the vendors, and the clock is ticked until every graph has been shown. `StallMonitor`
+records the longest gap between frames while that happens. With ``KIVY_GL_BACKEND=mock``, three runs
+of 10 days at 1440x720 gave, in ms, the median and maximum over the days of the worst stall per day,
+and the median time to show every graph::
+
+    renderer      median        max         load
+    worker         18-25      26-36      481-641
+    main         250-310    307-358      555-642
+
+so rendering off the main thread keeps every frame within about two frame times, instead of
+stalling for each graph in turn, while the graphs take about as long to appear.
+"""
+import argparse
+import datetime
+import os
+import time
+from typing import Dict, Tuple
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import numpy as np
+from kivy.clock import Clock
+from kivy.core.window import Window  # noqa: F401, creates the GL context that textures need
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.widget import Widget
+
+from energyhub.history import ALL_SOURCES, GRAPH_KINDS, HistoryView
+from energyhub.profiling import StallMonitor
+from energyhub.utils import TimestampArray
+
+
+def day_timestamps(date: datetime.date, interval_minutes: int) -> TimestampArray:
+    minutes = np.arange(0, 24 * 60, interval_minutes)
+    return TimestampArray.from_components(date.year, date.month, date.day, minutes // 60, minutes % 60)
+
+
+def synthetic_sources(rng: np.random.Generator, date: datetime.date) -> Dict[str, Tuple[TimestampArray, Dict]]:
+    def power(n_points):
+        return rng.uniform(0, 2000, n_points) * (rng.random(n_points) > 0.3)
+
+    def energy():
+        return rng.uniform(0, 10000)
+
+    sources = {}
+    timestamps = day_timestamps(date, 5)
+    sources['solar'] = (timestamps, {**{name: power(timestamps.size)
+                                        for name in ('purchased', 'export', 'production', 'consumption')},
+                                     **{name: energy() for name in ('purchased_energy', 'export_energy',
+                                                                    'production_energy', 'consumption_energy')}})
+    sources['battery'] = (timestamps, {'charge_power_from_grid': np.zeros(timestamps.size),
+                                       'charge_power_from_solar': power(timestamps.size),
+                                       'discharge_power': power(timestamps.size),
+                                       'charge_percentage': rng.uniform(0, 100, timestamps.size),
+                                       'charge_from_grid_energy': 0.,
+                                       'charge_from_solar_energy': energy(),
+                                       'discharge_energy': energy(),
+                                       })
+    timestamps = day_timestamps(date, 1)
+    for diverter in ('zappi', 'eddi'):
+        sources[diverter] = (timestamps, {'total_power': power(timestamps.size), 'total_energy': energy()})
+    heat_pump_series = ('DHW', 'heating', 'legionnaires', 'combined', 'unknown')
+    sources['heat_pump'] = (timestamps, {**{f'{name}_power': power(timestamps.size) for name in heat_pump_series},
+                                         **{f'{name}_energy': energy() for name in heat_pump_series}})
+    timestamps = day_timestamps(date, 10)
+    sources['car'] = (timestamps, {'battery_level': rng.uniform(0, 100, timestamps.size)})
+    return sources
+
+
+def load_day(view: HistoryView, shown: set, date: datetime.date, sources: Dict, size: Tuple[int, int],
+             timeout: float = 60) -> float:
+    """Load ``sources`` into ``view``, ticking the clock until every graph is shown, and return how long that took."""
+    start = time.perf_counter()
+    shown.clear()
+    generation = object()
+    view.start(date, size, generation, expected=ALL_SOURCES)
+    for source, (timestamps, data) in sources.items():
+        view.add_source(generation, source, timestamps, data)
+        Clock.tick()
+    while len(shown) < len(GRAPH_KINDS):
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f'Only {sorted(shown)} were shown within {timeout} s')
+        Clock.tick()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=10, help='number of synthetic days')
+    parser.add_argument('--width', type=int, default=1440, help='graph width in pixels')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(args.days)]
+    days = [(date, synthetic_sources(rng, date)) for date in dates]
+    size = (args.width, args.width // 2)
+    print(f'{args.days} days, at {size[0]}x{size[1]}: worst stall per day, and time to show every graph, in ms')
+    print(f'{"renderer":<10} {"median":>8} {"max":>8} {"load":>8}')
+    for renderer, on_main_thread in (('worker', False), ('main', True)):
+        shown = set()
+        scroll_view = ScrollView(size=(size[0], size[1] * len(GRAPH_KINDS)))
+        view = HistoryView(scroll_view, Widget(), render_on_main_thread=on_main_thread, on_shown=shown.add)
+        monitor = StallMonitor()
+        # the first day creates the figures, which is not what is being measured
+        load_day(view, shown, *days[0], size)
+        monitor.start()
+        stalls, loads = [], []
+        for date, sources in days:
+            monitor.reset()
+            loads.append(load_day(view, shown, date, sources, size))
+            stalls.append(monitor.reset())
+        monitor.stop()
+        view.executor.shutdown()
+        print(f'{renderer:<10} {1000 * np.median(stalls):8.1f} {1000 * max(stalls):8.1f} '
+              f'{1000 * np.median(loads):8.1f}')
+
+
+if __name__ == '__main__':
+    main()
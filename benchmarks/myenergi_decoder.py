@@ -0,0 +1,134 @@
+"""
+Benchmark of the MyEnergi minute-data decoder against the previous per-dict implementation.
+
+Run from the repository root with::
+
+    python -m benchmarks.myenergi_decoder [--payloads DIR]
+
+DIR should contain one JSON file per day, each holding the list returned by
+``MyEnergiHost.get_minute_data``. Without it, a year of synthetic payloads with the same
+structure (zero-valued fields omitted) is generated.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from energyhub.models.diverter_models import (MY_ENERGI_NAME_MAPPING, decode_minute_data, hourly_mean_voltage,
+                                              minute_columns_to_arrays)
+
+
+def legacy_history_dict_to_arrays(zappi_data: List[Dict]):
+    timestamps = []
+    powers = {}
+    for name in MY_ENERGI_NAME_MAPPING:
+        powers[name] = []
+    volts = []
+    for datapoint in zappi_data:
+        timestamp = datetime.datetime(year=datapoint['yr'],
+                                      month=datapoint['mon'],
+                                      day=datapoint['dom'],
+                                      hour=datapoint.get('hr', 0),
+                                      minute=datapoint.get('min', 0),
+                                      )
+        timestamps.append(timestamp)
+        volts.append(datapoint['v1'])
+        for name, myenergi_name in MY_ENERGI_NAME_MAPPING.items():
+            powers[name].append(datapoint.get(myenergi_name, 0))
+    timestamps = np.array(timestamps)
+    for name in MY_ENERGI_NAME_MAPPING:
+        powers[name] = np.array(powers[name], dtype=float)
+    volts = np.array(volts)/10
+    to_watts = 4/volts
+    for name in MY_ENERGI_NAME_MAPPING:
+        powers[name] *= to_watts
+    powers['total'] = powers['diverted'] + powers['imported']
+    for name in list(powers):
+        powers[name + '_power'] = powers.pop(name)
+    return timestamps, powers
+
+
+def legacy_decode(data: List[Dict]):
+    timestamps, powers = legacy_history_dict_to_arrays(data)
+    mean_voltage_per_hour = {hour: np.mean([d['v1'] for d in data if d.get('hr', 0) == hour]) for hour in range(24)}
+    return timestamps, powers, mean_voltage_per_hour
+
+
+def vectorised_decode(data: List[Dict]):
+    columns = decode_minute_data(data)
+    timestamps, powers = minute_columns_to_arrays(columns)
+    return timestamps, powers, hourly_mean_voltage(columns)
+
+
+def synthetic_day(date: datetime.date, rng: random.Random) -> List[Dict]:
+    day = []
+    for minute_of_day in range(24 * 60):
+        datapoint = {'yr': date.year, 'mon': date.month, 'dom': date.day, 'dow': date.strftime('%a'),
+                     'hr': minute_of_day // 60, 'min': minute_of_day % 60,
+                     'v1': rng.randint(2350, 2450), 'frq': rng.randint(4990, 5010),
+                     'imp': rng.choice((0, 0, rng.randint(0, 400000))),
+                     'exp': rng.choice((0, 0, rng.randint(0, 200000))),
+                     'h1d': rng.choice((0, 0, 0, rng.randint(0, 180000))),
+                     'h1b': rng.choice((0, 0, 0, rng.randint(0, 420000))),
+                     }
+        day.append({key: value for key, value in datapoint.items() if value != 0})
+    return day
+
+
+def load_payloads(directory: str) -> List[List[Dict]]:
+    payloads = []
+    for filename in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(filename) as file:
+            payloads.append(json.load(file))
+    return payloads
+
+
+def time_decoder(decoder, payloads) -> float:
+    start = time.perf_counter()
+    for payload in payloads:
+        decoder(payload)
+    return time.perf_counter() - start
+
+
+def check_consistent(payload: List[Dict]):
+    legacy_timestamps, legacy_powers, legacy_volts = legacy_decode(payload)
+    timestamps, powers, volts = vectorised_decode(payload)
+    assert np.array_equal(legacy_timestamps.astype('datetime64[s]'), timestamps)
+    for name, power in legacy_powers.items():
+        assert np.allclose(power, powers[name]), name
+    assert np.allclose([legacy_volts[hour] for hour in range(24)], volts, equal_nan=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', help='directory of recorded get_minute_data JSON payloads')
+    parser.add_argument('--days', type=int, default=365, help='number of synthetic days if no payloads given')
+    args = parser.parse_args()
+
+    if args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        rng = random.Random(0)
+        start = datetime.date(2022, 1, 1)
+        payloads = [synthetic_day(start + datetime.timedelta(days=i), rng) for i in range(args.days)]
+    n_entries = sum(len(payload) for payload in payloads)
+    print(f'{len(payloads)} days, {n_entries} minute entries')
+
+    for payload in payloads:
+        check_consistent(payload)
+
+    legacy_time = time_decoder(legacy_decode, payloads)
+    vectorised_time = time_decoder(vectorised_decode, payloads)
+    print(f'legacy:     {legacy_time:.3f} s ({1000 * legacy_time / len(payloads):.2f} ms/day)')
+    print(f'vectorised: {vectorised_time:.3f} s ({1000 * vectorised_time / len(payloads):.2f} ms/day)')
+    print(f'speed-up:   {legacy_time / vectorised_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
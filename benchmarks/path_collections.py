@@ -0,0 +1,90 @@
+"""
+Benchmark of `RendererKivy.draw_path_collection` in the garden matplotlib backend, comparing the
+batched meshes with the instruction group per path that it replaced.
+
+Run from the repository root with::
+
+    python -m benchmarks.path_collections [--paths N [N ...]] [--repeats N]
+
+On a machine without a display, set KIVY_GL_BACKEND=mock. Times are then only for building the
+instructions, not for drawing them.
+
+Each case draws a collection of N outlined rectangles in four colours, as a bar chart would. It
+reports the time to draw it and the number of canvas instructions that result.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import kivy.garden
+import numpy as np
+from kivy.core.window import Window  # noqa: F401, creates the GL context that meshes need
+
+# garden looks beside sys.argv[0], which is inside benchmarks/ when run with -m
+kivy.garden.garden_app_dir = os.path.join(os.getcwd(), 'libs', 'garden')
+from kivy.garden.matplotlib.backend_kivy import FigureCanvasKivy, RendererKivy  # noqa: E402
+from matplotlib.backend_bases import RendererBase  # noqa: E402
+from matplotlib.collections import PolyCollection  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+COLORS = ('tab:blue', 'tab:orange', 'tab:green', 'tab:red')
+
+
+def rectangles(rng: np.random.Generator, n_paths: int) -> PolyCollection:
+    x = rng.uniform(0, 1, n_paths)
+    y = rng.uniform(0, 1, n_paths)
+    width = 0.5 / np.sqrt(n_paths)
+    corners = np.array([(0, 0), (width, 0), (width, width), (0, width)])
+    polygons = np.stack((x, y), axis=1)[:, None, :] + corners
+    return PolyCollection(polygons, facecolors=[COLORS[i % len(COLORS)] for i in range(n_paths)],
+                          edgecolors='black', linewidths=1)
+
+
+def count_instructions(canvas_widget: FigureCanvasKivy) -> int:
+    widgets = [canvas_widget] + canvas_widget.children
+    return sum(len(widget.canvas.children) for widget in widgets)
+
+
+def time_draw(n_paths: int, repeats: int) -> (float, int):
+    collection = rectangles(np.random.default_rng(0), n_paths)
+    figure = Figure()
+    canvas_widget = FigureCanvasKivy(figure)
+    ax = figure.subplots()
+    ax.add_collection(collection)
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    renderer = RendererKivy(canvas_widget)
+    renderer.widget.size = (800, 600)
+    figure.set_size_inches(8, 6)
+    elapsed = 0.
+    for _ in range(repeats):
+        canvas_widget.canvas.clear()
+        canvas_widget.clear_widgets()
+        renderer.clip_rectangles = []
+        start = time.perf_counter()
+        collection.draw(renderer)
+        elapsed += time.perf_counter() - start
+    return 1000 * elapsed / repeats, count_instructions(canvas_widget)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, nargs='+', default=[1000, 10000], help='numbers of paths to draw')
+    parser.add_argument('--repeats', type=int, default=3, help='draws of each collection')
+    args = parser.parse_args()
+
+    batched = RendererKivy.draw_path_collection
+    print(f'{"paths":>6} {"renderer":<9} {"ms":>9} {"instructions":>13}')
+    for n_paths in args.paths:
+        # the base class draws each path separately, through draw_path
+        for name, method in (('per path', RendererBase.draw_path_collection), ('batched', batched)):
+            RendererKivy.draw_path_collection = method
+            milliseconds, instructions = time_draw(n_paths, args.repeats)
+            print(f'{n_paths:>6} {name:<9} {milliseconds:9.1f} {instructions:>13}')
+    RendererKivy.draw_path_collection = batched
+
+
+if __name__ == '__main__':
+    main()
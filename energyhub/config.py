@@ -3,10 +3,9 @@ import inspect
 import logging
 import os.path
 import sys
+from functools import lru_cache
 from typing import List
 
-import yaml
-
 LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 TIMESTAMP = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
 
@@ -58,6 +57,7 @@ class Config:
 
 
 def load_config() -> Config:
+    import yaml
     with open("site_config.yml", 'r') as file:
         config_data = yaml.safe_load(file)
     return Config(config_data)
@@ -80,5 +80,17 @@ def setup_logging():
     return logger_
 
 
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    """The site config, which is read on first use rather than when this module is imported."""
+    return load_config()
+
+
+def __getattr__(name):
+    # keeps "from energyhub.config import config" working, while deferring the YAML parsing to it
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 logger = setup_logging()
-config = load_config()
@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import Executor, Future, InvalidStateError
+from functools import partial
+from typing import List, Optional, Tuple
+
+
+class ConnectionGate(Executor):
+    """Passes work on to ``executor``, but holds it back while a connection is being made.
+
+    The gate starts open. ``close`` holds back everything submitted afterwards, returning futures
+    that complete once the work has been run. ``open`` passes the held work on, and ``fail`` instead
+    fails it with an error, as it does anything submitted later until the gate is opened. Nothing
+    waits on a worker thread, so that a slow connection to one vendor cannot starve the others of
+    threads in a shared executor. Cancelling a held future stops its work from being run, and as
+    with any future, fails once the work is running.
+    """
+    OPEN = 'open'
+    CLOSED = 'closed'
+    FAILED = 'failed'
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self.state = self.OPEN
+        self._error: Optional[BaseException] = None
+        self._held: List[Tuple[Future, callable, tuple, dict]] = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.state == self.CLOSED:
+                future = _HeldFuture()
+                self._held.append((future, function, args, kwargs))
+                return future
+            error = self._error if self.state == self.FAILED else None
+        if error is not None:
+            future = Future()
+            future.set_exception(error)
+            return future
+        return self.executor.submit(function, *args, **kwargs)
+
+    def close(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._error = None
+
+    def open(self):
+        with self._lock:
+            self.state = self.OPEN
+            held, self._held = self._held, []
+        for proxy, function, args, kwargs in held:
+            if proxy.cancelled():
+                continue
+            future = self.executor.submit(_run_held, proxy, function, args, kwargs)
+            proxy.work = future
+            future.add_done_callback(partial(_copy_outcome, proxy))
+
+    def fail(self, error: BaseException):
+        """Fail the held work with ``error``, unless the gate has been opened already."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                return
+            self.state = self.FAILED
+            self._error = error
+            held, self._held = self._held, []
+        for proxy, *_ in held:
+            if proxy.set_running_or_notify_cancel():
+                proxy.set_exception(error)
+
+    def shutdown(self, wait=True, **kwargs):
+        self.executor.shutdown(wait, **kwargs)
+
+
+class _HeldFuture(Future):
+    """The future of held work, which once passed on is only cancelled along with the ``work`` future."""
+
+    def __init__(self):
+        super().__init__()
+        self.work: Optional[Future] = None
+
+    def cancel(self) -> bool:
+        # the work's future knows whether it has started, even before _run_held marks this one running
+        if self.work is not None and not self.work.cancel():
+            return False
+        return super().cancel()
+
+
+def _run_held(proxy: Future, function, args: tuple, kwargs: dict):
+    if not proxy.set_running_or_notify_cancel():
+        return None
+    return function(*args, **kwargs)
+
+
+def _copy_outcome(proxy: Future, future: Future):
+    try:
+        if future.cancelled():
+            proxy.cancel()
+        elif future.exception() is not None:
+            proxy.set_exception(future.exception())
+        else:
+            proxy.set_result(future.result())
+    except InvalidStateError:
+        # the proxy was cancelled while the work ran
+        pass
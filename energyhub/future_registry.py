@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from functools import partial
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+class FutureRegistry:
+    """Futures submitted to an executor, keyed by ``(function name, args)``.
+
+    Submitting a key that is still in flight returns the existing future, rather than running the
+    function a second time. Completed futures are kept so that their results can be collected,
+    but only the ``max_completed`` most recent ones, and none for longer than ``max_age`` seconds.
+    Keys that ``group`` maps to a group, rather than to None, are not evicted by count or age.
+    Instead only the latest submitted of each group is kept once it has completed, whatever the
+    other keys of the group.
+    """
+
+    def __init__(self, executor: Executor, max_completed: int = 32, max_age: float = 600,
+                 group: Callable[[Hashable], Optional[Hashable]] = None):
+        self.executor = executor
+        self.max_completed = max_completed
+        self.max_age = max_age
+        self.group = group
+        self.hits = 0
+        self.misses = 0
+        self.merges = 0
+        self._futures: Dict[Hashable, Future] = OrderedDict()
+        self._completed_at: Dict[Future, float] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, function: callable, *args) -> Future:
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                self.merges += 1
+                return future
+            future = self.executor.submit(function, *args)
+            previous = self._futures.pop(key, None)
+            self._completed_at.pop(previous, None)
+            self._futures[key] = future
+            self._evict()
+        # outside the lock, as the callback runs immediately if the future has already finished
+        future.add_done_callback(partial(self._on_done, key))
+        return future
+
+    def get(self, *keys: Hashable) -> Optional[Future]:
+        """Return the future for the first of ``keys`` that is registered, or None."""
+        with self._lock:
+            self._evict()
+            for key in keys:
+                future = self._futures.get(key)
+                if future is not None:
+                    self.hits += 1
+                    return future
+            self.misses += 1
+            return None
+
+    def cancel(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Cancel the queued futures whose key matches ``predicate``. Running futures are left alone."""
+        with self._lock:
+            futures = [future for key, future in self._futures.items() if predicate(key)]
+        return sum(future.cancel() for future in futures)
+
+    def values(self) -> List[Future]:
+        with self._lock:
+            return list(self._futures.values())
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._futures),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'merges': self.merges,
+                    }
+
+    def _on_done(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                self._completed_at[future] = time.monotonic()
+
+    def _evict(self):
+        # must be called with the lock held
+        oldest_allowed = time.monotonic() - self.max_age
+        groups = {key: self.group(key) for key in self._futures} if self.group is not None else {}
+        # keys are in the order they were submitted, so the last of each group is its latest
+        latest = {group: key for key, group in groups.items() if group is not None}
+        for key, group in groups.items():
+            future = self._futures[key]
+            if group is not None and latest[group] != key and future in self._completed_at:
+                del self._futures[key]
+                del self._completed_at[future]
+        completed = [key for key, future in self._futures.items()
+                     if future in self._completed_at and groups.get(key) is None]
+        n_to_drop = len(completed) - self.max_completed
+        for i, key in enumerate(completed):
+            future = self._futures[key]
+            if i < n_to_drop or self._completed_at[future] < oldest_allowed:
+                del self._futures[key]
+                del self._completed_at[future]
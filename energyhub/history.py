@@ -0,0 +1,774 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from kivy.clock import Clock, mainthread
+from kivy.graphics import Color, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.widget import Widget
+from matplotlib import rcParams
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextToPath
+
+from ecoforest.plotting import stacked_bar
+from energyhub.mesh_graph import MAX_ZOOM, MeshGraph
+from energyhub.snapshot_cache import SnapshotCache
+from energyhub.utils import Resampler, TimestampArray, downsample_indices, popup_on_error
+
+# Everything here apart from FigureImage, history_widget and HistoryView is free of Kivy graphics calls,
+# and uses the object-oriented matplotlib API rather than pyplot, so that it can be run away from the main thread.
+
+CONSUMPTION_COLOR = (0.84, 0.00, 0.00)
+BATTERY_COLOR = (0.00, 0.75, 0.00)
+SOLAR_COLOR = (0.00, 0.9, 0.00)
+EXPORT_COLOR = (0.58, 0.05, 0.31)
+IMPORT_COLOR = (0.5, 0.5, 0.5)
+CONSUMER_COLORS = ((0.26, 0.46, 0.91),  # car
+                   (0.26, 0.84, 0.91),  # immersion
+                   (1.00, 0.50, 0.00),  # DHW
+                   (1.00, 0.75, 0.25),  # heating
+                   (1.00, 0.50, 0.00),  # legionnaires
+                   (1.00, 0.50, 0.00),  # combined
+                   (1.00, 0.50, 0.00),  # unknown HP
+                   BATTERY_COLOR,  # Battery
+                   CONSUMPTION_COLOR,  # Other
+                   )
+CONSUMER_HATCHING = (None,  # car
+                     None,  # immersion
+                     None,  # DHW
+                     None,  # heating
+                     '||',  # legionnaires
+                     '//',  # combined
+                     '*',  # unknown HP
+                     None,  # Battery
+                     None,  # Other
+                     )
+
+# Time series are downsampled to this many points per pixel of graph width before plotting
+POINTS_PER_PIXEL = 2
+
+# The vendor histories that the graphs are drawn from, as (timestamps, data) pairs
+SOURCES = frozenset(('solar', 'battery', 'zappi', 'eddi', 'heat_pump'))
+PRODUCTION_SOURCES = frozenset(('solar', 'battery'))
+# The car is not part of the energy balance, so is kept apart from the other sources
+ALL_SOURCES = SOURCES | frozenset(('car',))
+
+
+def compute_history(sources: Dict[str, Tuple[TimestampArray, Dict]]) -> Dict:
+    """Everything the graphs need that can be computed from the ``sources`` that have arrived so far.
+
+    The powers are all resampled to the SolarEdge timestamps, so nothing else is computed without
+    'solar'. The car's battery level is kept at its own sample times.
+    The production and consumption values also need 'battery', and the breakdown by consumer needs
+    every source. ``history['sources']`` records which sources were used.
+    """
+    history = {'sources': frozenset(sources)}
+    if 'car' in sources:
+        # the car is sampled at its own times, so is not resampled
+        car_timestamps, car_data = sources['car']
+        history.update({'car_hours': car_timestamps.total_hours(),
+                        'car_battery_level': car_data['battery_level'],
+                        })
+    if 'solar' not in sources:
+        return history
+    ref_timestamps, solar_data = sources['solar']
+    history.update({'hours': ref_timestamps.total_hours(),
+                    'import_power': solar_data['purchased'],
+                    'export_power': solar_data['export'],
+                    'export_energy': solar_data['export_energy'],
+                    'import_energy': solar_data['purchased_energy'],
+                    'production_energy': solar_data['production_energy'],
+                    })
+    if 'battery' not in sources:
+        return history
+
+    battery_timestamps, battery_data = sources['battery']
+    battery_resampler = Resampler(ref_timestamps, battery_timestamps)
+    (battery_grid_charging,
+     battery_solar_charging,
+     battery_discharging) = battery_resampler.resample(
+        np.vstack((battery_data['charge_power_from_grid'],
+                   battery_data['charge_power_from_solar'],
+                   battery_data['discharge_power'],
+                   )))
+    battery_state = battery_resampler.resample(battery_data['charge_percentage'], fill='previous')
+
+    solar_production = solar_data['production'] + battery_solar_charging - battery_discharging
+    solar_consumption = solar_production - (solar_data['export'] + battery_solar_charging)
+
+    if battery_data['charge_from_grid_energy'] > 0:
+        total_consumption = solar_data['consumption_energy'] + battery_data['charge_from_grid_energy']
+        assert battery_state[-1] < 11
+    else:
+        total_consumption = solar_data['consumption_energy']
+    solar_consumption_energy = (solar_data['production_energy']
+                                - (solar_data['export_energy'] + battery_data['charge_from_solar_energy']))
+    history.update({'solar_consumption': solar_consumption,
+                    'battery_discharging': battery_discharging,
+                    'battery_solar_charging': battery_solar_charging,
+                    'battery_state': battery_state,
+                    'solar_consumption_energy': solar_consumption_energy,
+                    'battery_discharge_energy': battery_data['discharge_energy'],
+                    'battery_solar_charging_energy': battery_data['charge_from_solar_energy'],
+                    'total_consumption': total_consumption,
+                    })
+    if not SOURCES <= history['sources']:
+        return history
+
+    zappi_timestamps, zappi_powers = sources['zappi']
+    eddi_timestamps, eddi_powers = sources['eddi']
+    heat_pump_timestamps, heat_pump_data = sources['heat_pump']
+    car_charge_power = Resampler(ref_timestamps, zappi_timestamps).resample(zappi_powers['total_power'])
+    immersion_power = Resampler(ref_timestamps, eddi_timestamps).resample(eddi_powers['total_power'])
+    (dhw_power,
+     heating_power,
+     legionnaires_power,
+     combined_power,
+     unknown_heat_pump_power) = Resampler(ref_timestamps, heat_pump_timestamps).resample(
+        np.vstack((heat_pump_data['DHW_power'],
+                   heat_pump_data['heating_power'],
+                   heat_pump_data['legionnaires_power'],
+                   heat_pump_data['combined_power'],
+                   heat_pump_data['unknown_power'],
+                   )))
+
+    remaining_load = solar_data['consumption'] - (car_charge_power + immersion_power
+                                                  + dhw_power + heating_power
+                                                  + legionnaires_power + combined_power + unknown_heat_pump_power
+                                                  + battery_grid_charging)
+    remaining_energy = (solar_data['consumption_energy']
+                        - (heat_pump_data['heating_energy']
+                           + heat_pump_data['DHW_energy']
+                           + heat_pump_data['legionnaires_energy']
+                           + heat_pump_data['combined_energy']
+                           + heat_pump_data['unknown_energy']
+                           + zappi_powers['total_energy']
+                           + eddi_powers['total_energy']
+                           )
+                        )
+    history.update({'consumer_powers': (car_charge_power,
+                                        immersion_power,
+                                        dhw_power,
+                                        heating_power,
+                                        legionnaires_power,
+                                        combined_power,
+                                        unknown_heat_pump_power,
+                                        battery_grid_charging,
+                                        remaining_load,
+                                        ),
+                    'consumer_energies': (zappi_powers['total_energy'], eddi_powers['total_energy'],
+                                          heat_pump_data['DHW_energy'], heat_pump_data['heating_energy'],
+                                          heat_pump_data['legionnaires_energy'],
+                                          heat_pump_data['combined_energy'], heat_pump_data['unknown_energy'],
+                                          battery_data['charge_from_grid_energy'],
+                                          remaining_energy,
+                                          ),
+                    })
+    return history
+
+
+def new_figure(size: Tuple[int, int]) -> Figure:
+    dpi = rcParams['figure.dpi']
+    return Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+
+
+# Minimum gap between bar labels, as a fraction of the label height
+LABEL_PADDING = 0.15
+_text_to_path = TextToPath()
+
+
+def bar_label(val):
+    # if val < 100:
+    #     text = f'{val:.3g} Wh'
+    # else:
+    #     text = f'{val/1000:.3g} kWh'
+    text = f'{val / 1000:.3g}'
+    return text
+
+
+class PooledGraph:
+    """A figure that is built once and then updated in place for each new history.
+
+    Subclasses create their axes and artists in ``__init__`` and swap the data in ``update``, so
+    that changing date costs a data update and a redraw rather than a new figure.
+    """
+
+    def __init__(self, size: Tuple[int, int]):
+        self.figure = new_figure(size)
+        FigureCanvasAgg(self.figure)
+        self.size = size
+        self._layout_key = None
+
+    def update(self, history: Dict):
+        raise NotImplementedError
+
+    def resize(self, size: Tuple[int, int]):
+        if size != self.size:
+            self.figure.set_size_inches(size[0] / self.figure.dpi, size[1] / self.figure.dpi)
+            self.size = size
+
+    def render(self) -> np.ndarray:
+        self._layout()
+        return render_rgba(self.figure)
+
+    def _layout(self):
+        # tight_layout only needs repeating if something that affects the margins has changed
+        key = (self.size, tuple(tuple(ax.yaxis.get_major_formatter().format_ticks(ax.get_yticks()))
+                                for ax in self.figure.axes))
+        if key != self._layout_key:
+            self.figure.tight_layout()
+            self._layout_key = key
+
+
+class StackGraph(PooledGraph):
+    """Stacked powers against time, with the collections reshaped by ``set_verts`` for each history."""
+
+    def __init__(self, size: Tuple[int, int], series: Callable[[Dict], Sequence[np.ndarray]],
+                 labels: Sequence[str], colors: Sequence, hatch: Sequence = None):
+        super().__init__(size)
+        self.series = series
+        self.ax = self.figure.subplots()
+        self.stacks = self.ax.stackplot([0, 24], np.zeros((len(labels), 2)), labels=labels, colors=colors)
+        if hatch is not None:
+            for stack, stack_hatch in zip(self.stacks, hatch):
+                if stack_hatch is not None:
+                    stack.set_hatch(stack_hatch)
+        self.ax.legend()
+        self.ax.set_xticks([0, 6, 12, 18, 24])
+
+    def update(self, history: Dict):
+        x = history['hours']
+        tops = np.cumsum(np.asarray(self.series(history)) / 1000, axis=0)
+        # the same points for every layer, chosen to keep the peaks of the total
+        keep = downsample_indices(x, tops[-1], POINTS_PER_PIXEL * self.size[0])
+        x = x[keep]
+        tops = tops[:, keep]
+        bottoms = np.vstack((np.zeros_like(x), tops[:-1]))
+        for stack, bottom, top in zip(self.stacks, bottoms, tops):
+            stack.set_verts([np.concatenate((np.column_stack((x, top)),
+                                             np.column_stack((x[::-1], bottom[::-1]))))])
+        self.ax.ignore_existing_data_limits = True
+        self.ax.update_datalim(np.column_stack((np.tile(x, len(tops) + 1),
+                                                np.concatenate((bottoms[0], tops.ravel())))))
+        self.ax.autoscale_view()
+
+
+class LineGraph(PooledGraph):
+    """A single line against time, updated by ``set_data``."""
+
+    def __init__(self, size: Tuple[int, int], series: Callable[[Dict], np.ndarray], ylim=None,
+                 downsample: str = 'lttb', hours: Callable[[Dict], np.ndarray] = lambda history: history['hours']):
+        super().__init__(size)
+        self.series = series
+        self.hours = hours
+        self.downsample = downsample
+        self.ax = self.figure.subplots()
+        self.line, = self.ax.plot([], [])
+        if ylim is not None:
+            self.ax.set_ylim(ylim)
+        self.ax.set_xticks([0, 6, 12, 18, 24])
+
+    def update(self, history: Dict):
+        x = self.hours(history)
+        y = np.asarray(self.series(history))
+        keep = downsample_indices(x, y, POINTS_PER_PIXEL * self.size[0], self.downsample)
+        self.line.set_data(x[keep], y[keep])
+        self.ax.relim()
+        self.ax.autoscale_view(scaley=self.ax.get_autoscaley_on())
+
+
+class EnergyGraph(PooledGraph):
+    """The daily energy totals, as three labelled stacked bars whose heights are updated in place."""
+
+    def __init__(self, size: Tuple[int, int]):
+        super().__init__(size)
+        destination_ax, production_ax, consumption_ax = self.figure.subplots(1, 3, sharey=True)
+        self.bars = [LabelledStackedBar(destination_ax, len(CONSUMER_COLORS),
+                                        colors=CONSUMER_COLORS, hatching=CONSUMER_HATCHING),
+                     LabelledStackedBar(production_ax, 3, colors=(CONSUMPTION_COLOR, BATTERY_COLOR, IMPORT_COLOR)),
+                     LabelledStackedBar(consumption_ax, 3, colors=(CONSUMPTION_COLOR, BATTERY_COLOR, EXPORT_COLOR)),
+                     ]
+
+    def update(self, history: Dict):
+        destination_bar, production_bar, consumption_bar = self.bars
+        # the axes share y, so the order matters: the last call sets the limits for all three.
+        # The consumer bar is left empty until every source has arrived.
+        consumption_bar.update((history['solar_consumption_energy'],
+                                history['battery_solar_charging_energy'],
+                                history['export_energy'],
+                                ),
+                               total_value=history['production_energy'])
+        production_bar.update((history['solar_consumption_energy'],
+                               history['battery_discharge_energy'],
+                               history['import_energy'],
+                               ),
+                              total_value=history['total_consumption'])
+        if SOURCES <= history['sources']:
+            destination_bar.update(history['consumer_energies'], total_value=history['total_consumption'])
+        else:
+            destination_bar.clear()
+
+    def render(self) -> np.ndarray:
+        self._layout()
+        for bar in self.bars:
+            bar.place_labels()
+        return render_rgba(self.figure)
+
+
+class LabelledStackedBar:
+    def __init__(self, axes: Axes, n_values: int, colors=None, hatching=None):
+        self.axes = axes
+        self.bars = stacked_bar([0], *[0.] * n_values,
+                                ax=axes,
+                                total_width=1,
+                                colors=colors, hatch=hatching)
+        self.labels = [axes.text(0.6, 0, '', horizontalalignment='left', verticalalignment='center', visible=False)
+                       for _ in self.bars]
+        self._label_centres = np.zeros(len(self.labels))
+        self.total_label = axes.text(0., 0, '', horizontalalignment='center')
+        axes.set_xlim([-0.5, 1.5])
+        axes.set_xticks([])
+
+    def update(self, values: Sequence[float], total_value: float):
+        bar_base = 0.
+        for i, (bar, label, value) in enumerate(zip(self.bars, self.labels, values)):
+            val = value / 1000
+            bar[0].set_y(bar_base)
+            bar[0].set_height(val)
+            label.set_visible(bool(val > 0.1))
+            label.set_text(bar_label(value))
+            self._label_centres[i] = bar_base + 0.5 * val
+            bar_base += val
+        self.axes.set_ylim([0, (total_value / 1000) * 1.1])
+        # Label the total
+        self.total_label.set_position((0., (total_value / 1000) * 1.02))
+        self.total_label.set_text(bar_label(total_value))
+
+    def clear(self):
+        for bar, label in zip(self.bars, self.labels):
+            bar[0].set_height(0)
+            label.set_visible(False)
+        self.total_label.set_text('')
+
+    def place_labels(self):
+        # needs the final layout, so it is done just before rendering
+        visible = [i for i, label in enumerate(self.labels) if label.get_visible()]
+        if not visible:
+            return
+        bottom, top = self.axes.get_ylim()
+        data_per_pixel = (top - bottom) / self.axes.bbox.height
+        dpi = self.axes.figure.dpi
+        heights = [text_height(self.labels[i].get_text(), self.labels[i].get_fontproperties(), dpi)
+                   * data_per_pixel * (1 + LABEL_PADDING) for i in visible]
+        for i, centre in zip(visible, spread_labels(self._label_centres[visible], heights, lower=bottom)):
+            self.labels[i].set_position((0.6, centre))
+
+
+@lru_cache(maxsize=512)
+def text_height(text: str, font: FontProperties, dpi: float) -> float:
+    """The height in pixels of the box matplotlib lays ``text`` out in, when drawn in ``font``."""
+    # as in Text._get_layout, a line is never shorter than "lp", so that labels line up
+    heights = [_text_to_path.get_text_width_height_descent(line, font, ismath=False)[1] for line in (text, 'lp')]
+    return max(heights) * dpi / 72
+
+
+def spread_labels(centres: Sequence[float], heights: Sequence[float], lower: float = None) -> np.ndarray:
+    """Move labels vertically so that none of them overlap, while staying as close as possible to ``centres``.
+
+    Labels keep their order. Overlapping labels are merged into blocks that are stacked without gaps
+    and centred on the mean of their members' preferred positions, which takes O(n log n) for the
+    sort and O(n) after that. ``lower``, if given, is the lowest allowed bottom edge of any label.
+    """
+    centres = np.asarray(centres, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    order = np.argsort(centres, kind='stable')
+    # Each block is [first position in order, bottom, height, count, sum of preferred bottom - offset in block].
+    # The least-squares bottom for a block is then the mean of the last term.
+    blocks = []
+    for n, i in enumerate(order):
+        bottom = centres[i] - heights[i] / 2
+        block = [n, bottom, heights[i], 1, bottom]
+        while blocks and blocks[-1][1] + blocks[-1][2] > block[1]:
+            previous = blocks.pop()
+            # the members of the new block now sit on top of the previous block's
+            total = previous[4] + block[4] - block[3] * previous[2]
+            count = previous[3] + block[3]
+            block = [previous[0], total / count, previous[2] + block[2], count, total]
+        blocks.append(block)
+    if lower is not None:
+        # push any blocks below the limit up, along with those they would then overlap
+        floor = lower
+        for block in blocks:
+            block[1] = max(block[1], floor)
+            floor = block[1] + block[2]
+    placed = np.empty_like(centres)
+    for first, bottom, _, count, _ in blocks:
+        for i in order[first:first + count]:
+            placed[i] = bottom + heights[i] / 2
+            bottom += heights[i]
+    return placed
+
+
+class MeshSource:
+    """The data for a graph drawn by `MeshGraph`, as a frame of the hours followed by the top of each layer.
+
+    Stands in for a `PooledGraph` when a graph is drawn with Kivy instructions instead of matplotlib,
+    so there is nothing to rasterise away from the main thread.
+    """
+
+    def __init__(self, series: Callable[[Dict], Sequence[np.ndarray]], stacked: bool = True,
+                 convert_powers: bool = True):
+        self.series = series
+        self.stacked = stacked
+        self.convert_powers = convert_powers
+        self.size = None
+        self.frame = None
+
+    def resize(self, size: Tuple[int, int]):
+        self.size = size
+
+    def update(self, history: Dict):
+        y = np.atleast_2d(np.asarray(self.series(history), dtype=float))
+        if self.convert_powers:
+            y = y / 1000
+        if self.stacked:
+            y = np.cumsum(y, axis=0)
+        x = history['hours']
+        if self.size is not None:
+            # MeshGraph zooms without coming back here, so keep enough points for its closest zoom
+            keep = downsample_indices(x, y[-1], POINTS_PER_PIXEL * MAX_ZOOM * self.size[0])
+            x = x[keep]
+            y = y[:, keep]
+        self.frame = np.vstack((x, y))
+
+    def render(self) -> np.ndarray:
+        return self.frame
+
+
+GRAPH_KINDS = ('energy', 'consumers', 'sources', 'export', 'battery', 'car')
+# the graphs that can be drawn by MeshGraph, rather than rendered by matplotlib
+MESH_KINDS = ('consumers', 'sources', 'export', 'battery')
+STACK_GRAPHS = {'consumers': dict(series=lambda history: history['consumer_powers'],
+                                  labels=('Car charge', 'Immersion', 'DWH', 'Heating',
+                                          'Legionnaires', 'Combined HP', 'Unknown HP',
+                                          'Battery charging', 'Other'),
+                                  colors=CONSUMER_COLORS, hatch=CONSUMER_HATCHING,
+                                  ),
+                'sources': dict(series=lambda history: (history['solar_consumption'],
+                                                        history['battery_discharging'],
+                                                        history['import_power'],
+                                                        ),
+                                labels=('Solar consumption', 'Battery discharging', 'Import'),
+                                colors=(SOLAR_COLOR, BATTERY_COLOR, IMPORT_COLOR)
+                                ),
+                'export': dict(series=lambda history: (history['solar_consumption'],
+                                                       history['battery_solar_charging'],
+                                                       history['export_power'],
+                                                       ),
+                               labels=('Consumption', 'Battery charging', 'Export'),
+                               colors=(CONSUMPTION_COLOR, BATTERY_COLOR, EXPORT_COLOR)
+                               ),
+                }
+BATTERY_LIMITS = (0, 100)
+# The sources each graph needs before it can be drawn
+GRAPH_SOURCES = {'energy': PRODUCTION_SOURCES,
+                 'consumers': SOURCES,
+                 'sources': PRODUCTION_SOURCES,
+                 'export': PRODUCTION_SOURCES,
+                 'battery': PRODUCTION_SOURCES,
+                 'car': frozenset(('car',)),
+                 }
+# Sources that are drawn when they arrive, but not waited for: the energy graph's consumer bar
+GRAPH_OPTIONAL_SOURCES = {'energy': SOURCES - PRODUCTION_SOURCES}
+
+
+def graph_sources(kind: str, expected: frozenset = ALL_SOURCES) -> frozenset:
+    """Every source that the graph of ``kind`` uses, leaving out optional ones that are not all ``expected``."""
+    optional = GRAPH_OPTIONAL_SOURCES.get(kind, frozenset())
+    return GRAPH_SOURCES[kind] | (optional if optional <= expected else frozenset())
+
+
+def drawn_sources(kind: str, available: frozenset, expected: frozenset = ALL_SOURCES) -> frozenset:
+    """The sources the graph of ``kind`` would be drawn from. Optional sources only count once all have arrived."""
+    sources = available & GRAPH_SOURCES[kind]
+    optional = graph_sources(kind, expected) - GRAPH_SOURCES[kind]
+    if optional <= available:
+        sources |= optional
+    return sources
+
+
+def battery_series(history: Dict) -> np.ndarray:
+    return history['battery_state']
+
+
+def history_graph(kind: str, size: Tuple[int, int], mesh: bool = False) -> Union[PooledGraph, MeshSource]:
+    if kind == 'energy':
+        return EnergyGraph(size)
+    if kind == 'battery':
+        if mesh:
+            return MeshSource(battery_series, stacked=False, convert_powers=False)
+        return LineGraph(size, battery_series, ylim=BATTERY_LIMITS)
+    if kind == 'car':
+        return LineGraph(size, lambda history: history['car_battery_level'], ylim=BATTERY_LIMITS,
+                         hours=lambda history: history['car_hours'])
+    if mesh:
+        return MeshSource(STACK_GRAPHS[kind]['series'])
+    return StackGraph(size, **STACK_GRAPHS[kind])
+
+
+def history_widget(kind: str, mesh: bool) -> Widget:
+    if not mesh:
+        return FigureImage(size_hint_y=None)
+    if kind == 'battery':
+        return MeshGraph(line=True, ylim=BATTERY_LIMITS, size_hint_y=None)
+    options = STACK_GRAPHS[kind]
+    return MeshGraph(labels=options['labels'], colors=options['colors'], hatch=options.get('hatch'),
+                     size_hint_y=None)
+
+
+class HistoryView:
+    """The history graphs and their widgets, kept for the life of the app and reused for each date.
+
+    Every graph has a widget in ``graph_panel`` from the start, but a graph is only built and rendered
+    once its widget comes within ``preload`` viewport heights of the visible part of ``scroll_view``.
+    Graphs that have been further away than that for ``release_after`` seconds release their
+    textures, and are rendered again if they come back.
+
+    The vendor histories are passed to ``add_source`` as they arrive, and each graph is drawn as soon
+    as it has the sources in `GRAPH_SOURCES`, then again if an optional source arrives later. Until
+    then its widget is left as a placeholder. Graphs that need a source that is not expected, as its
+    vendor is not configured, are hidden, and optional sources that are not expected are not waited for.
+
+    Rendering happens on a single worker thread, as the figures are shared between dates, or on the
+    main thread if ``render_on_main_thread`` is set. Complete rendered images are stored in
+    ``snapshot_cache``, if given, so that graphs that have already been seen are shown without waiting
+    for their data. The graphs in ``mesh_kinds`` are drawn by `MeshGraph` rather than matplotlib.
+    ``on_shown``, if given, is called with the kind of each graph as it is shown.
+    """
+
+    def __init__(self, scroll_view: Widget, graph_panel: Widget, snapshot_cache: SnapshotCache = None,
+                 mesh_kinds: Sequence[str] = (), preload: float = 0.5, release_after: float = 30,
+                 render_on_main_thread: bool = False, on_shown: Callable[[str], None] = None):
+        unknown = set(mesh_kinds) - set(MESH_KINDS)
+        if unknown:
+            raise ValueError(f'Graphs {sorted(unknown)} cannot be drawn with meshes. Choose from {MESH_KINDS}')
+        self.scroll_view = scroll_view
+        self.graph_panel = graph_panel
+        self.snapshot_cache = snapshot_cache
+        self.mesh_kinds = tuple(mesh_kinds)
+        self.preload = preload
+        self.release_after = release_after
+        self.render_on_main_thread = render_on_main_thread
+        self.on_shown = on_shown
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # only used by the render thread
+        self.graphs: Dict[str, Union[PooledGraph, MeshSource]] = {}
+        # the rest are only used on the main thread
+        self.widgets: Dict[str, Widget] = {}
+        self.generation = None
+        self.date = None
+        self.size = None
+        self.expected = ALL_SOURCES
+        self._snapshot_generation = None
+        self.sources: Dict[str, Tuple[TimestampArray, Dict]] = {}
+        self.history = None
+        # kind -> (generation, sources drawn)
+        self._shown: Dict[str, Tuple[object, frozenset]] = {}
+        # (kind, sources) pairs waiting to be drawn
+        self._queued = set()
+        self._snapshot_misses = set()
+        self._hidden_since: Dict[str, float] = {}
+        self._visibility_trigger = Clock.create_trigger(self._update_visibility)
+        scroll_view.bind(scroll_y=self._visibility_trigger, size=self._visibility_trigger)
+        graph_panel.bind(size=self._visibility_trigger)
+        Clock.schedule_interval(self._release_hidden, release_after / 2)
+
+    def start(self, date: datetime.date, size: Tuple[int, int], generation, expected: frozenset = ALL_SOURCES):
+        """Begin loading ``date``, at ``size``. The ``expected`` sources are given to ``add_source`` as they arrive."""
+        self.generation = generation
+        self.expected = expected
+        self.date = date
+        self.size = size
+        # images of today rendered from these sources are only cached if no refresh has happened since
+        self._snapshot_generation = self.snapshot_cache.generation if self.snapshot_cache is not None else None
+        self.sources = {}
+        self.history = None
+        self._queued.clear()
+        self._snapshot_misses.clear()
+        for kind in GRAPH_KINDS:
+            widget = self.widgets.get(kind)
+            if widget is None:
+                widget = self.widgets[kind] = history_widget(kind, kind in self.mesh_kinds)
+                self.graph_panel.add_widget(widget)
+            if self._can_draw(kind):
+                widget.height = size[1]
+                widget.opacity = 0.5
+            else:
+                widget.height = 0
+                widget.opacity = 0
+        self._visibility_trigger()
+
+    def _can_draw(self, kind: str) -> bool:
+        return GRAPH_SOURCES[kind] <= self.expected
+
+    @mainthread
+    def add_source(self, generation, source: str, timestamps: TimestampArray, data: Dict):
+        if generation != self.generation:
+            return
+        self.sources[source] = (timestamps, data)
+        self._submit(self._compute, generation, dict(self.sources))
+
+    @popup_on_error('History plotting')
+    def _compute(self, generation, sources: Dict[str, Tuple[TimestampArray, Dict]]):
+        if generation == self.generation:
+            self._set_history(generation, compute_history(sources))
+
+    @mainthread
+    def _set_history(self, generation, history: Dict):
+        # computed in order on one thread, so a later history never has fewer sources
+        if generation != self.generation:
+            return
+        self.history = history
+        self._update_visibility()
+
+    def _submit(self, function: Callable, *args):
+        if self.render_on_main_thread:
+            Clock.schedule_once(lambda _: function(*args))
+        else:
+            self.executor.submit(function, *args)
+
+    def _is_near_viewport(self, widget: Widget) -> bool:
+        _, view_bottom = self.scroll_view.to_window(*self.scroll_view.pos)
+        _, bottom = widget.to_window(*widget.pos)
+        margin = self.preload * self.scroll_view.height
+        return (bottom < view_bottom + self.scroll_view.height + margin
+                and bottom + widget.height > view_bottom - margin)
+
+    def _update_visibility(self, *_):
+        now = time.monotonic()
+        available = self.history['sources'] if self.history is not None else frozenset()
+        for kind, widget in self.widgets.items():
+            if not self._can_draw(kind):
+                continue
+            if not self._is_near_viewport(widget):
+                self._hidden_since.setdefault(kind, now)
+                continue
+            self._hidden_since.pop(kind, None)
+            sources = drawn_sources(kind, available, self.expected)
+            shown_generation, shown_sources = self._shown.get(kind, (None, None))
+            if shown_generation == self.generation and shown_sources >= sources:
+                continue
+            if (kind, sources) in self._queued:
+                continue
+            can_draw = GRAPH_SOURCES[kind] <= available
+            may_be_cached = (self.snapshot_cache is not None and kind not in self.mesh_kinds
+                             and kind not in self._snapshot_misses)
+            if can_draw or may_be_cached:
+                self._queued.add((kind, sources))
+                self._submit(self._render, self.generation, kind, sources, self.date, self.size,
+                             self.history if can_draw else None, self._snapshot_generation)
+
+    def _release_hidden(self, _):
+        now = time.monotonic()
+        for kind, hidden_since in self._hidden_since.items():
+            if now - hidden_since > self.release_after and kind in self._shown:
+                self.widgets[kind].release()
+                del self._shown[kind]
+
+    @popup_on_error('History plotting')
+    def _render(self, generation, kind: str, sources: frozenset, date: datetime.date, size: Tuple[int, int],
+                history: Optional[Dict], snapshot_generation: Optional[int]):
+        try:
+            if generation != self.generation:
+                return
+            mesh = kind in self.mesh_kinds
+            # images without an optional source that is not configured are not cached, so are redrawn if it is
+            complete = sources == graph_sources(kind)
+            if self.snapshot_cache is not None and not mesh and kind not in self._snapshot_misses:
+                image = self.snapshot_cache.get(date, kind, size, rcParams['figure.dpi'])
+                if image is not None:
+                    self._finish(generation, kind, sources, graph_sources(kind), image)
+                    return
+            if history is None:
+                self._finish(generation, kind, sources, None, None)
+                return
+            graph = self.graphs.get(kind)
+            if graph is None:
+                graph = self.graphs[kind] = history_graph(kind, size, mesh)
+            graph.resize(size)
+            graph.update(history)
+            image = graph.render()
+            if self.snapshot_cache is not None and not mesh and complete:
+                self.snapshot_cache.put(date, kind, size, graph.figure.dpi, image, snapshot_generation)
+            self._finish(generation, kind, sources, sources, image)
+        except Exception:
+            # let the graph be queued again, rather than waiting for a _finish that will never come
+            self._unqueue(generation, kind, sources)
+            raise
+
+    @mainthread
+    def _unqueue(self, generation, kind: str, queued_sources: frozenset):
+        if generation == self.generation:
+            self._queued.discard((kind, queued_sources))
+
+    @mainthread
+    def _finish(self, generation, kind: str, queued_sources: frozenset, sources: Optional[frozenset],
+                image: Optional[np.ndarray]):
+        if generation != self.generation:
+            return
+        self._queued.discard((kind, queued_sources))
+        if image is None:
+            # not in the snapshot cache, so wait for the data
+            self._snapshot_misses.add(kind)
+            return
+        widget = self.widgets[kind]
+        widget.show(image)
+        if sources >= GRAPH_SOURCES[kind]:
+            widget.opacity = 1
+        self._shown[kind] = (generation, sources)
+        if self.on_shown is not None:
+            self.on_shown(kind)
+
+
+def render_rgba(fig: Figure) -> np.ndarray:
+    """Rasterise ``fig`` with Agg, returning a (height, width, 4) array that the caller owns."""
+    canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+    canvas.draw()
+    return np.array(canvas.buffer_rgba())
+
+
+class FigureImage(Widget):
+    """Displays a figure that has already been rasterised by `render_rgba`."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.texture = None
+        with self.canvas:
+            Color(1.0, 1.0, 1.0, 1.0)
+            self.rect = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._update_rect, size=self._update_rect)
+
+    def show(self, rgba: np.ndarray):
+        height, width, _ = rgba.shape
+        # the texture is only replaced when the image size changes
+        if self.texture is None or self.texture.size != (width, height):
+            self.texture = Texture.create(size=(width, height))
+            self.texture.flip_vertical()
+            self.rect.texture = self.texture
+        # blit_buffer needs a flat buffer; this only copies if rgba is not already contiguous
+        self.texture.blit_buffer(np.ascontiguousarray(rgba).reshape(-1), colorfmt='rgba', bufferfmt='ubyte')
+        self.canvas.ask_update()
+
+    def release(self):
+        self.texture = None
+        self.rect.texture = None
+
+    def _update_rect(self, *_):
+        self.rect.pos = self.pos
+        self.rect.size = self.size
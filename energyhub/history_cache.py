@@ -0,0 +1,69 @@
+import datetime
+import os
+import threading
+import zipfile
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from energyhub.utils import TimestampArray
+
+
+class HistoryCache:
+    """On-disk cache of the per-day ``(timestamps, data)`` results returned by the models.
+
+    Each entry is an uncompressed ``.npz`` file, stored under ``<directory>/<model>/<function>/``.
+    Days that were already over (plus ``settle_time`` for late vendor uploads) when they were
+    fetched never expire. Anything fetched before then, i.e. today, is only reused for ``ttl``.
+    """
+    TIMESTAMPS_KEY = '__timestamps__'
+    FETCHED_AT_KEY = '__fetched_at__'
+
+    def __init__(self, directory: str,
+                 ttl: datetime.timedelta = datetime.timedelta(minutes=10),
+                 settle_time: datetime.timedelta = datetime.timedelta(hours=1)):
+        self.directory = directory
+        self.ttl = ttl
+        self.settle_time = settle_time
+
+    def _path(self, model_name: str, function_name: str, date: datetime.date, args: Sequence) -> str:
+        filename = '_'.join([date.isoformat(), *[str(arg) for arg in args]]) + '.npz'
+        return os.path.join(self.directory, model_name, function_name.lstrip('_'), filename)
+
+    def is_fresh(self, date: datetime.date, fetched_at: datetime.datetime) -> bool:
+        end_of_day = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time(0))
+        if fetched_at >= end_of_day + self.settle_time:
+            return True
+        return datetime.datetime.now() - fetched_at < self.ttl
+
+    def load(self, model_name: str, function_name: str, date: datetime.date,
+             args: Sequence = ()) -> Optional[Tuple[TimestampArray, Dict[str, np.ndarray]]]:
+        path = self._path(model_name, function_name, date, args)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as entry:
+                fetched_at = entry[self.FETCHED_AT_KEY].astype(datetime.datetime).item()
+                if not self.is_fresh(date, fetched_at):
+                    return None
+                timestamps = entry[self.TIMESTAMPS_KEY].view(TimestampArray)
+                data = {key: (value.item() if value.ndim == 0 else value)
+                        for key, value in ((key, entry[key]) for key in entry.files)
+                        if key not in (self.TIMESTAMPS_KEY, self.FETCHED_AT_KEY)}
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # a truncated or otherwise unreadable entry is treated as a miss, and will be overwritten
+            return None
+        return timestamps, data
+
+    def store(self, model_name: str, function_name: str, date: datetime.date, args: Sequence,
+              timestamps: np.ndarray, data: Dict[str, np.ndarray]):
+        path = self._path(model_name, function_name, date, args)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {key: np.asarray(value) for key, value in data.items()}
+        arrays[self.TIMESTAMPS_KEY] = np.asarray(timestamps, dtype=TimestampArray.DTYPE)
+        arrays[self.FETCHED_AT_KEY] = np.datetime64(datetime.datetime.now(), 's')
+        # write to a temporary file first, so that a reader never sees a partial entry
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temp_path, path)
@@ -1,41 +1,44 @@
-from threading import Thread
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-import numpy as np
 from kivy.app import App
-from kivy.clock import Clock, mainthread
-from kivy.properties import NumericProperty, AliasProperty, ObjectProperty
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.properties import NumericProperty, AliasProperty, ObjectProperty, StringProperty
 from kivy.utils import platform
 
-from matplotlib import pyplot as plt
-from adjustText import adjust_text
-
-# noinspection PyUnresolvedReferences
-from kivy.garden.matplotlib import FigureCanvasKivyAgg
-
-from ecoforest.plotting import stacked_bar
-from energyhub.models.car_models import JLRCarModel
-from energyhub.models.diverter_models import MyEnergiModel
-from energyhub.models.heat_pump_models import EcoforestModel
-from energyhub.models.solar_models import SolarEdgeModel
-from energyhub.utils import popup_on_error, normalise_to_timestamps
-from energyhub.config import config
+from energyhub.history_cache import HistoryCache
+from energyhub.models.registry import MODEL_REGISTRY
+from energyhub.profiling import StallMonitor, report_first_frame
+from energyhub.snapshot_cache import SnapshotCache
+from energyhub.state_store import StateStore
+from energyhub.token_store import TokenStore
+from energyhub.utils import popup_on_error
+from energyhub.config import get_config
 
 # kivy.require('1.0.7')
 
 from kivy.core.window import Window
 if platform != 'android':
     Window.size = (1440/5, 3216/5)
-    plt.rcParams['font.size'] = 12
-else:
-    plt.rcParams['font.size'] = 24
+
+# Set ENERGYHUB_MEASURE_STALLS to log the longest main-thread stall each time the history is loaded.
+# ENERGYHUB_RENDER_ON_MAIN_THREAD restores the old behaviour of plotting on the main thread, for comparison.
+# ENERGYHUB_PROFILE_STARTUP prints the time of the first frame and exits, for energyhub.profiling.
+MEASURE_STALLS = bool(os.environ.get('ENERGYHUB_MEASURE_STALLS'))
+RENDER_ON_MAIN_THREAD = bool(os.environ.get('ENERGYHUB_RENDER_ON_MAIN_THREAD'))
+PROFILE_STARTUP = bool(os.environ.get('ENERGYHUB_PROFILE_STARTUP'))
+# Seconds to wait for a vendor to connect, unless its site_config.yml section sets connect-timeout
+CONNECT_TIMEOUT = 30
+# Threads in the executor shared by the models, for each vendor in site_config.yml
+WORKERS_PER_MODEL = 2
 
 
 # TODO swipe down to refresh
 #   refresh clock
 #   refresh on resume
 #   more current status
-# TODO save state?
-# TODO caching of myenergi/solar_edge history
 # TODO handle errors on connection
 # TODO fix history bugs on 29/12, 26/12
 # TODO settings
@@ -63,6 +66,7 @@ class EnergyHubApp(App):
     _dhw_power = NumericProperty(0)
     _car_charger_power = NumericProperty(0)
     _immersion_power = NumericProperty(0)
+    connecting_label = StringProperty('')
 
     @property
     def small_size(self):
@@ -70,18 +74,36 @@ class EnergyHubApp(App):
 
     def __init__(self, **kwargs):
         super(EnergyHubApp, self).__init__(**kwargs)
+        config = get_config()
         self._refreshing = False
-        self.solar_model = SolarEdgeModel(config.data['solar-edge']['api-key'],
-                                          config.data['solar-edge']['site-id'])
-        self.car_model = JLRCarModel(config.data['jlr']['username'],
-                                     config.data['jlr']['password'],
-                                     config.data['jlr'].get('vin', None))
-        self.heat_pump_model = EcoforestModel(config.data['ecoforest']['server'],
-                                              config.data['ecoforest']['port'],
-                                              config.data['ecoforest']['serial-number'],
-                                              config.data['ecoforest']['auth-key'])
-        self.diverter_model = MyEnergiModel(config.data['myenergi']['username'],
-                                            config.data['myenergi']['api-key'])
+        self._history_generation = 0
+        self.stall_monitor = StallMonitor() if MEASURE_STALLS else None
+        self.history_view = None
+        self.snapshot_cache = SnapshotCache(os.path.join(self.user_data_dir, 'snapshots'))
+        history_cache = HistoryCache(os.path.join(self.user_data_dir, 'history'))
+        state_store = StateStore(os.path.join(self.user_data_dir, 'state.json'))
+        token_store = TokenStore(os.path.join(self.user_data_dir, 'tokens.json'))
+        # Only the vendors in site_config.yml are connected. The others still get a placeholder of
+        # their own model class: current_status.kv binds to each vendor's own properties, so the class
+        # must be imported. That only costs the model module, as vendor SDKs are imported on connecting,
+        # and a placeholder never connects, refreshes or fetches.
+        enabled_keys = [key for key in MODEL_REGISTRY if key in config.data]
+        self.model_executor = ThreadPoolExecutor(max_workers=max(WORKERS_PER_MODEL * len(enabled_keys), 1))
+        self._model_config_keys = []
+        for config_key, entry in MODEL_REGISTRY.items():
+            model_class = entry.load()
+            if config_key in enabled_keys:
+                model = model_class.from_config(config.data[config_key],
+                                                executor=self.model_executor,
+                                                history_cache=history_cache,
+                                                state_store=state_store,
+                                                token_store=token_store,
+                                                data_dir=self.user_data_dir)
+                self._model_config_keys.append((model, config_key))
+            else:
+                Logger.info(f'EnergyHub: {model_class.vendor} is not in site_config.yml, so is not connected')
+                model = model_class.placeholder(executor=self.model_executor)
+            setattr(self, entry.app_property, model)
 
         self.solar_model.bind(load=self.setter('_solar_edge_load'),
                               )
@@ -91,22 +113,51 @@ class EnergyHubApp(App):
         self.diverter_model.bind(immersion_power=self.setter('_immersion_power'),
                                  car_charger_power=self.setter('_car_charger_power'),
                                  )
+        for model in self.models:
+            model.bind(stale=self._on_model_stale,
+                       connecting=self._on_model_connecting)
 
     @property
     def models(self):
-        return [self.solar_model, self.car_model, self.heat_pump_model, self.diverter_model]
+        """The models of the vendors in site_config.yml"""
+        return [model for model, _ in self._model_config_keys]
+
+    @property
+    def model_config_keys(self):
+        return iter(self._model_config_keys)
 
     def build(self):
         super(EnergyHubApp, self).build()
-        for model in self.models:
-            model.connect()
-        for model in self.models:
-            model.get_result('connect')
+        config = get_config()
+        if self.stall_monitor is not None:
+            self.stall_monitor.start()
+        if PROFILE_STARTUP:
+            report_first_frame(self)
+        # Nothing here waits for the vendors: each model holds back its refresh and history requests
+        # until it has connected, without taking a thread from the others, so a slow login only delays
+        # that vendor
+        for model, config_key in self.model_config_keys:
+            model.connect(timeout=config.data[config_key].get('connect-timeout', CONNECT_TIMEOUT))
         self.refresh()
         # build graphs needs to be called after initialisation to get sizes correct
-        Clock.schedule_once(lambda x: Thread(self.build_history_graphs()).start(), 0.1)
+        Clock.schedule_once(lambda x: self.request_history_graphs(), 0.1)
         Clock.schedule_interval(lambda x: self._check_refreshing(), 1)
 
+    def _build_history_view(self):
+        # matplotlib and the plotting code are only imported once the history is first needed, after
+        # the first frame, as the current status tab does not use them
+        from matplotlib import rcParams
+        from energyhub.history import HistoryView
+        rcParams['font.size'] = 24 if platform == 'android' else 12
+        # e.g. "history: {mesh-graphs: [consumers, battery]}" in site_config.yml draws those graphs with
+        # Kivy instructions instead of matplotlib
+        history_panel = self.root.ids.history
+        return HistoryView(history_panel.ids.graph_scroll, history_panel.ids.graph_panel,
+                           self.snapshot_cache,
+                           mesh_kinds=get_config().data.get('history', {}).get('mesh-graphs', ()),
+                           render_on_main_thread=RENDER_ON_MAIN_THREAD,
+                           on_shown=self._on_history_graph_shown)
+
     def on_pause(self):
         return True
 
@@ -114,6 +165,15 @@ class EnergyHubApp(App):
         for model in self.models:
             model.refresh()
 
+    def _on_model_stale(self, _, stale):
+        if not stale:
+            # a refresh has brought new data, so today's graphs are out of date
+            self.snapshot_cache.invalidate_open()
+
+    def _on_model_connecting(self, *_):
+        vendors = [model.vendor for model in self.models if model.connecting]
+        self.connecting_label = f'Connecting to {", ".join(vendors)}' if vendors else ''
+
     def check_pull_refresh(self, view):
         if view.scroll_y < 2 or self.refreshing:
             return
@@ -164,251 +224,53 @@ class EnergyHubApp(App):
                 size = (25 + (70 * power / 5000))
             return size
 
-    @popup_on_error('History fetching')
-    def build_history_graphs(self, date=None):
+    def request_history_graphs(self, date=None):
+        # Each request gets a new generation. Queued fetches for other dates are cancelled, and
+        # anything already running for an older generation is never plotted.
         history_panel = self.root.ids.history
-        date_picker = self.root.ids.history.ids.history_date
-        graph_panel = history_panel.ids.graph_panel
-        for graph_widget in graph_panel.children:
-            plt.close(graph_widget.figure)
-        graph_panel.clear_widgets()
         if date is None:
-            date = date_picker.date
-        self.solar_model.get_history_for_date(date)
-        self.solar_model.get_battery_history_for_date(date)
-        self.diverter_model.get_history_for_date(date, 'Z')
-        self.diverter_model.get_history_for_date(date, 'E')
-        self.heat_pump_model.get_history_for_date(date)
-
-        solar_timestamps, solar_data = self.solar_model.get_result('get_history_for_date', date)
-        zappi_timestamps, zappi_powers = self.diverter_model.get_result('get_history_for_date', date, 'Z')
-        eddi_timestamps, eddi_powers = self.diverter_model.get_result('get_history_for_date', date, 'E')
-        battery_timestamps, battery_data = self.solar_model.get_result('get_battery_history_for_date', date)
-        heat_pump_timestamps, heat_pump_data = self.heat_pump_model.get_result('get_history_for_date', date)
-
-        self._plot_history_data(solar_timestamps, solar_data, zappi_timestamps, zappi_powers,
-                                eddi_timestamps, eddi_powers, heat_pump_timestamps, heat_pump_data,
-                                battery_timestamps, battery_data)
-
-    @mainthread
-    @popup_on_error('History plotting')
-    def _plot_history_data(self, solar_timestamps, solar_data,
-                           zappi_timestamps, zappi_powers,
-                           eddi_timestamps, eddi_powers,
-                           heat_pump_timestamps, heat_pump_data,
-                           battery_timestamps, battery_data):
-        production_power = solar_data['production']
-        load_power = solar_data['consumption']
-        export_power = solar_data['export']
-        import_power = solar_data['purchased']
-
-        ref_timestamps = solar_timestamps
-        car_charge_power = normalise_to_timestamps(ref_timestamps, zappi_timestamps,
-                                                   zappi_powers['total_power'])
-        immersion_power = normalise_to_timestamps(ref_timestamps, eddi_timestamps,
-                                                  eddi_powers['total_power'])
-        dhw_power = normalise_to_timestamps(ref_timestamps, heat_pump_timestamps,
-                                            heat_pump_data['DHW_power'])
-        heating_power = normalise_to_timestamps(ref_timestamps, heat_pump_timestamps,
-                                                heat_pump_data['heating_power'])
-        legionnaires_power = normalise_to_timestamps(ref_timestamps, heat_pump_timestamps,
-                                                     heat_pump_data['legionnaires_power'])
-        combined_power = normalise_to_timestamps(ref_timestamps, heat_pump_timestamps,
-                                                 heat_pump_data['combined_power'])
-        unknown_heat_pump_power = normalise_to_timestamps(ref_timestamps, heat_pump_timestamps,
-                                                          heat_pump_data['unknown_power'])
-        battery_grid_charging = normalise_to_timestamps(ref_timestamps, battery_timestamps,
-                                                        battery_data['charge_power_from_grid'])
-        battery_solar_charging = normalise_to_timestamps(ref_timestamps, battery_timestamps,
-                                                         battery_data['charge_power_from_solar'])
-        battery_discharging = normalise_to_timestamps(ref_timestamps, battery_timestamps,
-                                                      battery_data['discharge_power'])
-        battery_state = normalise_to_timestamps(ref_timestamps, battery_timestamps,
-                                                battery_data['charge_percentage'])
-
-        remaining_load = load_power - (car_charge_power + immersion_power
-                                       + dhw_power + heating_power
-                                       + legionnaires_power + combined_power + unknown_heat_pump_power
-                                       + battery_grid_charging)
-
-        solar_production = production_power + battery_solar_charging - battery_discharging
-        solar_consumption = solar_production - (export_power + battery_solar_charging)
-
-        if battery_data['charge_from_grid_energy'] > 0:
-            total_consumption = solar_data['consumption_energy'] + battery_data['charge_from_grid_energy']
-            assert battery_state[-1] < 11
-        else:
-            total_consumption = solar_data['consumption_energy']
-        battery_discharge_energy = battery_data['discharge_energy']
-        solar_production_energy = solar_data['production_energy']
-        export_energy = solar_data['export_energy']
-        battery_solar_charging_energy = battery_data['charge_from_solar_energy']
-        solar_consumption_energy = (solar_production_energy
-                                    - (export_energy + battery_solar_charging_energy))
-
-        remaining_energy = (solar_data['consumption_energy']
-                            - (heat_pump_data['heating_energy']
-                               + heat_pump_data['DHW_energy']
-                               + heat_pump_data['legionnaires_energy']
-                               + heat_pump_data['combined_energy']
-                               + heat_pump_data['unknown_energy']
-                               + zappi_powers['total_energy']
-                               + eddi_powers['total_energy']
-                               )
-                            )
-        consumption_color = (0.84, 0.00, 0.00)
-        battery_color = (0.00, 0.75, 0.00)
-        solar_color = (0.00, 0.9, 0.00)
-        export_color = (0.58, 0.05, 0.31)
-        import_color = (0.5, 0.5, 0.5)
-        colors = ((0.26, 0.46, 0.91),  # car
-                  (0.26, 0.84, 0.91),  # immersion
-                  (1.00, 0.50, 0.00),  # DHW
-                  (1.00, 0.75, 0.25),  # heating
-                  (1.00, 0.50, 0.00),  # legionnaires
-                  (1.00, 0.50, 0.00),  # combined
-                  (1.00, 0.50, 0.00),  # unknown HP
-                  battery_color,  # Battery
-                  consumption_color,  # Other
-                  )
-        hatching = (None,  # car
-                    None,  # immersion
-                    None,  # DHW
-                    None,  # heating
-                    '||',  # legionnaires
-                    '//',  # combined
-                    '*',  # unknown HP
-                    None,  # Battery
-                    None,  # Other
-                    )
-
-        history_panel = self.root.ids.history.ids.graph_panel
-        fig = plt.figure()
-        destination_ax, production_ax, consumption_ax = fig.subplots(1, 3, sharey=True)
-        self.labelled_stacked_bar(consumption_ax,
-                                  (solar_consumption_energy,
-                                   battery_solar_charging_energy,
-                                   export_energy,
-                                   ),
-                                  total_value=solar_data['production_energy'],
-                                  colors=(consumption_color, battery_color, export_color)
-                                  )
-        self.labelled_stacked_bar(production_ax,
-                                  (solar_consumption_energy,
-                                   battery_discharge_energy,
-                                   solar_data['purchased_energy'],
-                                   ),
-                                  total_value=total_consumption,
-                                  colors=(consumption_color, battery_color, import_color)
-                                  )
-        self.labelled_stacked_bar(destination_ax,
-                                  (zappi_powers['total_energy'], eddi_powers['total_energy'],
-                                   heat_pump_data['DHW_energy'], heat_pump_data['heating_energy'],
-                                   heat_pump_data['legionnaires_energy'],
-                                   heat_pump_data['combined_energy'], heat_pump_data['unknown_energy'],
-                                   battery_data['charge_from_grid_energy'],
-                                   remaining_energy,
-                                   ),
-                                  total_value=total_consumption,
-                                  colors=colors, hatching=hatching)
-        widget = FigureCanvasKivyAgg(fig)
-        widget.size_hint_y = None
-        widget.height = self.root.width * 0.5
-        history_panel.add_widget(widget)
-
-        ref_hours = ref_timestamps.total_hours()
-        self._plot_to_history_panel(ref_hours, (car_charge_power,
-                                                immersion_power,
-                                                dhw_power,
-                                                heating_power,
-                                                legionnaires_power,
-                                                combined_power,
-                                                unknown_heat_pump_power,
-                                                battery_grid_charging,
-                                                remaining_load,
-                                                ),
-                                    labels=('Car charge', 'Immersion', 'DWH', 'Heating',
-                                            'Legionnaires', 'Combined HP', 'Unknown HP',
-                                            'Battery charging', 'Other'),
-                                    colors=colors, hatch=hatching,
-                                    )
-        # plt.plot(ref_hours, load_power/1000, linestyle='--')
-
-        self._plot_to_history_panel(ref_hours, (solar_consumption,
-                                                battery_discharging,
-                                                import_power,
-                                                ),
-                                    labels=('Solar consumption', 'Battery discharging', 'Import'),
-                                    colors=(solar_color, battery_color, import_color)
-                                    )
-        # plt.plot(ref_hours, load_power/1000, linestyle='--')
-
-        self._plot_to_history_panel(ref_hours, (solar_consumption,
-                                                battery_solar_charging,
-                                                export_power
-                                                ),
-                                    labels=('Consumption', 'Battery charging', 'Export'),
-                                    colors=(consumption_color, battery_color, export_color)
-                                    )
-
-        ax = self._plot_to_history_panel(ref_hours, battery_state, convert_powers=False,
-                                         # labels=('Battery state', ),
-                                         plot_fun=plt.plot,
-                                         )
-        ax.set_ylim([0, 100])
-
-    def labelled_stacked_bar(self, axes, values, total_value, colors=None, hatching=None):
-        bars = stacked_bar([0], *[v/1000 for v in values],
-                           ax=axes,
-                           total_width=1,
-                           colors=colors, hatch=hatching)
-        labels = []
-        for bar in bars:
-            if bar.datavalues[0] > 0.1:
-                val = bar.datavalues[0]
-                bar_base = bar[0].xy[1]
-                label_height = bar_base + 0.5 * val
-                text = self._bar_label(val * 1000)  # convert val back to Wh
-                labels.append(axes.text(0.6, label_height, text, horizontalalignment='left'))
-        axes.set_ylim([0, (total_value / 1000) * 1.1])
-        axes.set_xlim([-0.5, 1.5])
-        # Label the total
-        axes.text(0., (total_value / 1000) * 1.02,
-                  self._bar_label(total_value),
-                  horizontalalignment='center')
-        plt.xticks([])
-        plt.tight_layout()
-        adjust_text(labels, only_move={'text': 'y'}, autoalign=False, text_from_points=False,
-                    save_steps=False, ha='left', ax=axes)
+            date = history_panel.ids.history_date.date
+        self._history_generation += 1
+        for model in self.models:
+            model.cancel_history(keep_date=date)
+        size = (int(self.root.width), int(self.root.width * 0.5))
+        if self.history_view is None:
+            self.history_view = self._build_history_view()
+        enabled = self.models
+        requests = {'solar': (self.solar_model, self.solar_model.get_history_for_date, ()),
+                    'battery': (self.solar_model, self.solar_model.get_battery_history_for_date, ()),
+                    'zappi': (self.diverter_model, self.diverter_model.get_history_for_date, ('Z',)),
+                    'eddi': (self.diverter_model, self.diverter_model.get_history_for_date, ('E',)),
+                    'heat_pump': (self.heat_pump_model, self.heat_pump_model.get_history_for_date, ()),
+                    'car': (self.car_model, self.car_model.get_history_for_date, ()),
+                    }
+        # the sources of vendors that are not configured never arrive, so the history view hides the
+        # graphs that need them, and does not wait for them
+        expected = frozenset(source for source, (model, _, _) in requests.items() if model in enabled)
+        # graphs are built and rendered by the history view as they scroll into sight, and as soon
+        # as the sources they depend on have arrived
+        self.history_view.start(date, size, self._history_generation, expected)
+        futures = {source: get_history(date, *args)
+                   for source, (model, get_history, args) in requests.items() if source in expected}
+        for source, future in futures.items():
+            future.add_done_callback(partial(self._on_history_source, self._history_generation, source))
+
+    def _is_current_history(self, generation):
+        return generation == self._history_generation
 
-    @staticmethod
-    def _bar_label(val):
-        # if val < 100:
-        #     text = f'{val:.3g} Wh'
-        # else:
-        #     text = f'{val/1000:.3g} kWh'
-        text = f'{val / 1000:.3g}'
-        return text
-
-    def _plot_to_history_panel(self, x, y, plot_fun=plt.stackplot, hatch=None,
-                               convert_powers: bool = True, **kwargs):
-        history_panel = self.root.ids.history.ids.graph_panel
-        fig = plt.figure()
-        if convert_powers:
-            y = np.asarray(y) / 1000
-        plots = plot_fun(x, y, **kwargs)
-        if hatch is not None:
-            for stack, hatch in zip(plots, hatch):
-                if hatch is not None:
-                    stack.set_hatch(hatch)
-        plt.legend()
-        plt.xticks([0, 6, 12, 18, 24])
-        plt.tight_layout()
-        widget = FigureCanvasKivyAgg(fig)
-        widget.size_hint_y = None
-        widget.height = self.root.width * 0.5
-        history_panel.add_widget(widget)
-        return plt.gca()
+    @popup_on_error('History fetching')
+    def _on_history_source(self, generation, source, future):
+        # called on the model's thread when the fetch finishes
+        if future.cancelled() or not self._is_current_history(generation):
+            # superseded by a request for another date
+            return
+        timestamps, data = future.result()
+        self.history_view.add_source(generation, source, timestamps, data)
+
+    def _on_history_graph_shown(self, kind):
+        if self.stall_monitor is not None:
+            Logger.info(f'EnergyHub: longest main-thread stall while loading the {kind} history graph: '
+                        f'{1000 * self.stall_monitor.reset():.0f} ms')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,284 @@
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import (Color, InstructionGroup, Line, Mesh, PopMatrix, PushMatrix, Rectangle, Scale,
+                           StencilPop, StencilPush, StencilUnUse, StencilUse, Translate)
+from kivy.graphics.texture import Texture
+from kivy.properties import ListProperty
+from kivy.uix.widget import Widget
+from matplotlib import rcParams
+from matplotlib.colors import to_rgb
+
+# Graphs drawn with Kivy instructions rather than matplotlib. The vertices are kept in data
+# coordinates, and mapped onto the widget by a Translate and Scale, so that panning and zooming only
+# change those two instructions.
+
+HOUR_STEPS = (0.25, 0.5, 1, 2, 3, 6, 12)
+VALUE_STEPS = (1, 2, 2.5, 5, 10)
+HATCH_SIZE = 16
+MAX_ZOOM = 24
+_hatch_textures: Dict[str, Texture] = {}
+
+
+def nice_ticks(low: float, high: float, steps: Sequence[float], max_ticks: int = 6,
+               scale_steps: bool = True) -> np.ndarray:
+    """Evenly spaced ticks between ``low`` and ``high``, at the smallest of ``steps`` that gives at most ``max_ticks``.
+
+    If ``scale_steps`` is set, ``steps`` are multiplied by a power of ten to suit the range.
+    """
+    span = high - low
+    if not span > 0:
+        return np.array([low])
+    magnitude = 10 ** math.floor(math.log10(span / max_ticks)) if scale_steps else 1
+    for step in steps:
+        step *= magnitude
+        if span / step <= max_ticks:
+            break
+    # adding zero turns any -0. into 0., so that it is not labelled '-0'
+    return np.arange(math.ceil(low / step) * step, high + step * 1e-6, step) + 0.
+
+
+def hatch_texture(hatch: str) -> Texture:
+    """A repeating texture approximating a matplotlib hatch pattern ('|', '/' or '*', doubled for density)."""
+    texture = _hatch_textures.get(hatch)
+    if texture is None:
+        pixels = np.zeros((HATCH_SIZE, HATCH_SIZE, 4), dtype=np.uint8)
+        spacing = HATCH_SIZE // max(len(hatch), 1)
+        rows, columns = np.indices((HATCH_SIZE, HATCH_SIZE))
+        if hatch[0] == '|':
+            mask = columns % spacing == 0
+        elif hatch[0] == '/':
+            mask = (rows + columns) % spacing == 0
+        else:
+            mask = (rows % spacing < 2) & (columns % spacing < 2)
+        pixels[mask] = (0, 0, 0, 255)
+        texture = Texture.create(size=(HATCH_SIZE, HATCH_SIZE), colorfmt='rgba')
+        texture.blit_buffer(pixels.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+        texture.wrap = 'repeat'
+        _hatch_textures[hatch] = texture
+    return texture
+
+
+class MeshGraph(Widget):
+    """Stacked areas, or a single line, against time of day, drawn with Kivy ``Mesh`` and ``Line`` instructions.
+
+    ``show`` takes a frame from `energyhub.history.MeshSource`: the hours in the first row, followed by
+    the top of each stacked layer (or the line). Drag to pan, pinch or scroll to zoom, and double-tap
+    to reset the view.
+    """
+    x_range = ListProperty([0., 24.])
+    y_range = ListProperty([0., 1.])
+
+    def __init__(self, labels: Sequence[str] = (), colors: Sequence = (), hatch: Sequence = None,
+                 line: bool = False, ylim: Tuple[float, float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.labels = labels
+        self.colors = colors
+        self.hatch = hatch if hatch is not None else [None] * len(colors)
+        self.line = line
+        self.ylim = ylim
+        self.font_size = rcParams['font.size'] * rcParams['figure.dpi'] / 72
+        self._frame: Optional[np.ndarray] = None
+        self._label_textures: Dict[str, Texture] = {}
+        self._touches = []
+
+        with self.canvas:
+            Color(1, 1, 1, 1)
+            self._background = Rectangle()
+            StencilPush()
+            self._stencil = Rectangle()
+            StencilUse()
+            PushMatrix()
+            self._translate = Translate()
+            self._scale = Scale()
+            self._layers = InstructionGroup()
+            PopMatrix()
+            StencilUnUse()
+            self._stencil_mask = Rectangle()
+            StencilPop()
+            self._axes = InstructionGroup()
+            self._legend = InstructionGroup()
+        self.bind(pos=self._redraw, size=self._redraw, x_range=self._redraw, y_range=self._redraw)
+
+    @property
+    def plot_area(self) -> Tuple[float, float, float, float]:
+        """The x, y, width and height of the plotted region, leaving room for the tick labels."""
+        left = 3.5 * self.font_size
+        bottom = 2 * self.font_size
+        top = 0.5 * self.font_size
+        right = 0.5 * self.font_size
+        return (self.x + left, self.y + bottom,
+                max(self.width - left - right, 1), max(self.height - bottom - top, 1))
+
+    def show(self, frame: np.ndarray):
+        self._frame = frame
+        if self.ylim is not None:
+            y_range = list(self.ylim)
+        else:
+            y_range = [min(0., float(frame[1:].min(initial=0))), float(frame[1:].max(initial=0))]
+            margin = 0.05 * (y_range[1] - y_range[0])
+            y_range = [y_range[0] - (margin if y_range[0] < 0 else 0), y_range[1] + margin]
+        if y_range[1] <= y_range[0]:
+            y_range[1] = y_range[0] + 1
+        self.y_range = y_range
+        self._build_layers()
+        self._redraw()
+
+    def release(self):
+        """Drop the layers' vertices, until the next call to ``show``."""
+        self._frame = None
+        self._layers.clear()
+
+    def _build_layers(self):
+        self._layers.clear()
+        x = self._frame[0]
+        if self.line:
+            # the first colour of matplotlib's cycle, as used for the line in the matplotlib version
+            self._layers.add(Color(*to_rgb(rcParams['axes.prop_cycle'].by_key()['color'][0])))
+            self._layers.add(Line(points=np.column_stack((x, self._frame[1])).ravel().tolist(), width=1))
+            return
+        tops = self._frame[1:]
+        bottoms = np.vstack((np.zeros_like(x), tops[:-1]))
+        indices = list(range(2 * len(x)))
+        # the hatching is sized for the current view, and stretches with any later zoom
+        _, _, width, height = self.plot_area
+        hours_per_pattern = HATCH_SIZE * (self.x_range[1] - self.x_range[0]) / width
+        values_per_pattern = HATCH_SIZE * (self.y_range[1] - self.y_range[0]) / height
+        for bottom, top, color, hatch in zip(bottoms, tops, self.colors, self.hatch):
+            # a triangle strip zig-zagging between the bottom and top of the layer, with texture
+            # coordinates for the hatching measured in pattern repeats
+            vertices = np.empty((len(x), 2, 4), dtype=np.float32)
+            vertices[:, :, 0] = x[:, np.newaxis]
+            vertices[:, 0, 1] = bottom
+            vertices[:, 1, 1] = top
+            vertices[:, :, 2] = vertices[:, :, 0] / hours_per_pattern
+            vertices[:, :, 3] = vertices[:, :, 1] / values_per_pattern
+            vertices = vertices.ravel().tolist()
+            self._layers.add(Color(*color))
+            self._layers.add(Mesh(vertices=vertices, indices=indices, mode='triangle_strip'))
+            if hatch is not None:
+                self._layers.add(Color(1, 1, 1, 1))
+                self._layers.add(Mesh(vertices=vertices, indices=indices, mode='triangle_strip',
+                                      texture=hatch_texture(hatch)))
+
+    def _redraw(self, *_):
+        plot_x, plot_y, width, height = self.plot_area
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        x_scale = width / (x1 - x0)
+        y_scale = height / (y1 - y0)
+        self._translate.xy = (plot_x - x0 * x_scale, plot_y - y0 * y_scale)
+        self._scale.xyz = (x_scale, y_scale, 1)
+        self._background.pos = self.pos
+        self._background.size = self.size
+        self._stencil.pos = self._stencil_mask.pos = (plot_x, plot_y)
+        self._stencil.size = self._stencil_mask.size = (width, height)
+        self._draw_axes()
+        self._draw_legend()
+
+    def _draw_axes(self):
+        plot_x, plot_y, width, height = self.plot_area
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        tick_length = 0.35 * self.font_size
+        self._axes.clear()
+        self._axes.add(Color(0, 0, 0, 1))
+        self._axes.add(Line(rectangle=(plot_x, plot_y, width, height), width=1))
+        for tick in nice_ticks(x0, x1, HOUR_STEPS, scale_steps=False):
+            x = plot_x + (tick - x0) * width / (x1 - x0)
+            self._axes.add(Line(points=(x, plot_y, x, plot_y - tick_length), width=1))
+            self._add_text(f'{tick:g}', x, plot_y - tick_length, anchor=(0.5, 1))
+        for tick in nice_ticks(y0, y1, VALUE_STEPS):
+            y = plot_y + (tick - y0) * height / (y1 - y0)
+            self._axes.add(Line(points=(plot_x - tick_length, y, plot_x, y), width=1))
+            self._add_text(f'{tick:g}', plot_x - 1.5 * tick_length, y, anchor=(1, 0.5))
+
+    def _draw_legend(self):
+        self._legend.clear()
+        if not self.labels:
+            return
+        plot_x, plot_y, width, height = self.plot_area
+        textures = [self._label_texture(label) for label in self.labels]
+        row_height = 1.4 * self.font_size
+        box_width = 2.5 * self.font_size + max(texture.width for texture in textures)
+        box_height = row_height * len(textures) + 0.4 * self.font_size
+        left = plot_x + width - box_width - 0.4 * self.font_size
+        top = plot_y + height - 0.4 * self.font_size
+        self._legend.add(Color(1, 1, 1, 0.8))
+        self._legend.add(Rectangle(pos=(left, top - box_height), size=(box_width, box_height)))
+        for i, (texture, color, hatch) in enumerate(zip(textures, self.colors, self.hatch)):
+            y = top - (i + 1) * row_height
+            swatch = dict(pos=(left + 0.4 * self.font_size, y + 0.2 * self.font_size),
+                          size=(1.5 * self.font_size, 0.8 * self.font_size))
+            self._legend.add(Color(*color))
+            self._legend.add(Rectangle(**swatch))
+            if hatch is not None:
+                self._legend.add(Color(1, 1, 1, 1))
+                self._legend.add(Rectangle(texture=hatch_texture(hatch), **swatch))
+            self._legend.add(Color(1, 1, 1, 1))
+            self._legend.add(Rectangle(texture=texture, pos=(left + 2.1 * self.font_size, y), size=texture.size))
+
+    def _add_text(self, text: str, x: float, y: float, anchor: Tuple[float, float]):
+        texture = self._label_texture(text)
+        self._axes.add(Color(1, 1, 1, 1))
+        self._axes.add(Rectangle(texture=texture, size=texture.size,
+                                 pos=(x - anchor[0] * texture.width, y - anchor[1] * texture.height)))
+
+    def _label_texture(self, text: str) -> Texture:
+        texture = self._label_textures.get(text)
+        if texture is None:
+            label = CoreLabel(text=text, font_size=self.font_size, color=(0, 0, 0, 1))
+            label.refresh()
+            texture = self._label_textures[text] = label.texture
+        return texture
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos) or self._frame is None:
+            return super().on_touch_down(touch)
+        if touch.is_mouse_scrolling:
+            if touch.button in ('scrollup', 'scrolldown'):
+                self._zoom(1.25 if touch.button == 'scrolldown' else 0.8, touch.x)
+                return True
+            return super().on_touch_down(touch)
+        if touch.is_double_tap:
+            self.x_range = [0., 24.]
+            return True
+        touch.grab(self)
+        self._touches.append(touch)
+        return True
+
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+        _, _, width, _ = self.plot_area
+        hours_per_pixel = (self.x_range[1] - self.x_range[0]) / width
+        if len(self._touches) == 1:
+            self._pan(-touch.dx * hours_per_pixel)
+        elif len(self._touches) == 2:
+            other = self._touches[0] if self._touches[1] is touch else self._touches[1]
+            before = abs(touch.px - other.x)
+            after = abs(touch.x - other.x)
+            if before > 0 and after > 0:
+                self._zoom(before / after, (touch.x + other.x) / 2)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        if touch in self._touches:
+            self._touches.remove(touch)
+        return True
+
+    def _pan(self, hours: float):
+        x0, x1 = self.x_range
+        hours = min(max(hours, -x0), 24 - x1)
+        self.x_range = [x0 + hours, x1 + hours]
+
+    def _zoom(self, factor: float, centre_x: float):
+        plot_x, _, width, _ = self.plot_area
+        x0, x1 = self.x_range
+        centre = x0 + (centre_x - plot_x) * (x1 - x0) / width
+        span = min(max((x1 - x0) * factor, 24 / MAX_ZOOM), 24)
+        x0 = min(max(centre - (centre - x0) * span / (x1 - x0), 0), 24 - span)
+        self.x_range = [x0, x0 + span]
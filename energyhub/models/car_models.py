@@ -1,64 +1,168 @@
 import datetime
+import os
 import time
-from typing import Dict
+from typing import Dict, Optional
+from urllib.error import HTTPError
 
-import jlrpy
 import numpy as np
-from kivy.clock import mainthread
+from kivy.clock import Clock
 from kivy.properties import NumericProperty, BooleanProperty, AliasProperty
 
 from .model import BaseModel
-from energyhub.utils import popup_on_error, NoSSLVerification, list_to_dict, km_to_miles
+from energyhub.sample_log import SampleLog
+from energyhub.utils import popup_on_error, NoSSLVerification, list_to_dict, km_to_miles, TimestampArray
+
+# Seconds for which the status held by the JLR servers is used as it is, without waking the car to update it.
+# site_config.yml can set this as status-max-age in the jlr section.
+STATUS_MAX_AGE = 15 * 60
+# The first and longest waits, in seconds, between checks on whether the car has sent its status, and the
+# time after which it is given up on
+POLL_FIRST_DELAY = 1
+POLL_MAX_DELAY = 8
+POLL_TIMEOUT = 30
+# Each status shown is recorded in the car's sample log, as the JLR servers keep no history. The charge
+# rate is NaN when the car does not report it.
+SAMPLE_DTYPE = np.dtype([('time', '<i8'),
+                         ('battery_level', '<f4'),
+                         ('range', '<f4'),
+                         ('charge_rate_miles', '<f4'),
+                         ('charge_rate_pc', '<f4'),
+                         ('charging', '?'),
+                         ])
 
 
 class JLRCarModel(BaseModel):
+    vendor = 'JLR'
+    # the history is read from the local sample log, which is always up to date
+    cache_history = False
     car_battery_level = NumericProperty(0.5)
     car_is_charging = BooleanProperty(False)
     car_range = NumericProperty(0.5)
     car_charge_rate_miles = NumericProperty(0.5)
     car_charge_rate_pc = NumericProperty(0.5)
 
-    def __init__(self, username, password, vin=None, *args, **kwargs):
+    def __init__(self, username, password, vin=None, *args, status_max_age: float = STATUS_MAX_AGE, **kwargs):
         super().__init__(*args, **kwargs)
         self.username = username
         self.password = password
         self.vin = vin
+        self.status_max_age = status_max_age
+        self._vehicle = None
+        self.sample_log = (None if self.data_dir is None
+                           else SampleLog(os.path.join(self.data_dir, 'jlr_samples.bin'), SAMPLE_DTYPE))
+        # the service request of a wake-up that is being waited for
+        self._service_id = None
+
+    @classmethod
+    def from_config(cls, section: Dict, **kwargs) -> 'JLRCarModel':
+        return cls(section['username'], section['password'], section.get('vin', None),
+                   status_max_age=section.get('status-max-age', STATUS_MAX_AGE), **kwargs)
 
     @property
     def vehicle(self):
-        if self.vin is None:
-            return self.connection.vehicles[0]
-        else:
-            return next((v for v in self.connection.vehicles if v.vin == self.vin))
+        # found once for each connection, as the connection's vehicles do not change
+        if self._vehicle is None:
+            if self.vin is None:
+                self._vehicle = self.connection.vehicles[0]
+            else:
+                self._vehicle = next((v for v in self.connection.vehicles if v.vin == self.vin))
+        return self._vehicle
 
     @popup_on_error('Error initialising JLR')
     def _connect(self):
+        import jlrpy
+        self._vehicle = None
+        tokens = None if self.token_store is None else self.token_store.load(self.username)
         with NoSSLVerification():
-            self.connection = jlrpy.Connection(self.username, self.password)
-            self.connection.refresh_tokens()
-
-    def _jlr_vehicle_server_refresh(self, timeout=30, retry_time=1):
-        vehicle = self.vehicle
-        response = vehicle.get_health_status()  # This should refresh status from the vehicle to JLR servers
-        refresh_status = 'Started'
-        elapsed_time = 0
-        while refresh_status == 'Started' and elapsed_time < timeout:
-            refresh_status = vehicle.get_service_status(response['customerServiceId'])['status']
-            time.sleep(retry_time)
-            elapsed_time += retry_time
-        if refresh_status != 'Successful':
-            raise ConnectionError('Could not refresh JLR vehicle')
-
-    @popup_on_error('JLR', cleanup_function=BaseModel._finish_refresh)
+            if tokens is not None:
+                try:
+                    # the saved refresh token saves logging in with the password
+                    self.connection = jlrpy.Connection(self.username, self.password,
+                                                       device_id=tokens['device_id'],
+                                                       refresh_token=tokens['refresh_token'])
+                except (HTTPError, KeyError):
+                    # the refresh token has expired, been revoked, or was not saved properly
+                    self.token_store.clear(self.username)
+                    tokens = None
+            if tokens is None:
+                self.connection = jlrpy.Connection(self.username, self.password)
+        self._save_tokens()
+
+    def _save_tokens(self):
+        # jlrpy refreshes its tokens as they expire, so they are saved again after each refresh
+        if self.token_store is None or self.connection is None:
+            return
+        self.token_store.save(self.username, {'device_id': self.connection.dev_id,
+                                              'refresh_token': self.connection.refresh_token,
+                                              })
+
+    @staticmethod
+    def _status_time(status) -> Optional[datetime.datetime]:
+        """When the car sent ``status`` to the JLR servers, if that is known"""
+        try:
+            return datetime.datetime.strptime(status['lastUpdatedTime'], '%Y-%m-%dT%H:%M:%S%z')
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _status_is_fresh(self, status) -> bool:
+        updated = self._status_time(status)
+        if updated is None:
+            return False
+        age = datetime.datetime.now(datetime.timezone.utc) - updated
+        return age.total_seconds() < self.status_max_age
+
+    def _end_refresh_unless_waking(self):
+        if self._service_id is None:
+            self._finish_refresh()
+
+    @popup_on_error('JLR', cleanup_function=_end_refresh_unless_waking)
     def _refresh(self):
+        """Show the status held by the JLR servers, waking the car for a new one if it is too old.
+
+        Waking the car starts a service request on the JLR servers, which is then checked from a timer
+        with increasing delays, so that no model thread is held while the car responds.
+        """
+        if self._service_id is not None:
+            # a wake-up is already being waited for, and will update the properties when it finishes
+            return
         with NoSSLVerification():
-            self._jlr_vehicle_server_refresh()
             status = self.vehicle.get_status()  # This should get status from JLR servers to us
+        self._save_tokens()
+        if self._status_is_fresh(status):
+            self.update_properties(status)
+            return
+        with NoSSLVerification():
+            response = self.vehicle.get_health_status()  # This should refresh status from the vehicle to JLR servers
+        self._service_id = response['customerServiceId']
+        self._schedule_service_check(self._service_id, time.monotonic(), POLL_FIRST_DELAY)
+
+    def _schedule_service_check(self, service_id, started: float, delay: float):
+        # nothing waits on a poll, so they bypass self.futures rather than each being kept in it
+        Clock.schedule_once(
+            lambda _: self.connection_gate.submit(self._check_service_status, service_id, started, delay), delay)
+
+    @popup_on_error('JLR', cleanup_function=_end_refresh_unless_waking)
+    def _check_service_status(self, service_id, started: float, delay: float):
+        try:
+            with NoSSLVerification():
+                refresh_status = self.vehicle.get_service_status(service_id)['status']
+            next_delay = min(2 * delay, POLL_MAX_DELAY)
+            if refresh_status == 'Started' and time.monotonic() + next_delay - started < POLL_TIMEOUT:
+                self._schedule_service_check(service_id, started, next_delay)
+                return
+            if refresh_status != 'Successful':
+                raise ConnectionError('Could not refresh JLR vehicle')
+            with NoSSLVerification():
+                status = self.vehicle.get_status()
+        except Exception:
+            self._service_id = None
+            raise
+        self._service_id = None
         self.update_properties(status)
 
-    @mainthread
     def _update_properties(self, status):
         # alerts = status['vehicleAlerts']
+        updated = self._status_time(status)
         status = status['vehicleStatus']
         ev_status = list_to_dict(status['evStatus'])
         self.car_battery_level = int(ev_status['EV_STATE_OF_CHARGE'])
@@ -70,9 +174,23 @@ class JLRCarModel(BaseModel):
             self.car_charge_rate_pc = float(ev_status['EV_CHARGING_RATE_SOC_PER_HOUR'])
         except ValueError:
             self.car_charge_rate_pc = -100
+        if self.sample_log is not None:
+            # a status that has not changed since the last refresh has the same time, and is not logged again
+            sample_time = updated.timestamp() if updated is not None else time.time()
+            charge_rate_pc = self.car_charge_rate_pc if self.car_charge_rate_pc >= 0 else np.nan
+            self.sample_log.append({'time': int(sample_time),
+                                    'battery_level': self.car_battery_level,
+                                    'range': self.car_range,
+                                    'charge_rate_miles': self.car_charge_rate_miles,
+                                    'charge_rate_pc': charge_rate_pc,
+                                    'charging': self.car_is_charging,
+                                    })
 
     def _get_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
-        raise NotImplementedError
+        samples = np.empty(0, SAMPLE_DTYPE) if self.sample_log is None else self.sample_log.read_date(date)
+        timestamps = TimestampArray.from_epoch(samples['time'])
+        data = {name: samples[name] for name in SAMPLE_DTYPE.names if name != 'time'}
+        return timestamps, data
 
     def _get_charge_label(self):
         return (f'{self.car_battery_level} %'
@@ -2,15 +2,14 @@ import datetime
 from typing import List, Dict
 
 import numpy as np
-from kivy.clock import mainthread
 from kivy.properties import NumericProperty
 
 from energyhub.models.model import BaseModel
 from energyhub.utils import popup_on_error, NoSSLVerification, TimestampArray
-from mec.zp import MyEnergiHost
 
 
 class MyEnergiModel(BaseModel):
+    vendor = 'MyEnergi'
     immersion_power = NumericProperty(0)
     car_charger_power = NumericProperty(0)
 
@@ -19,8 +18,13 @@ class MyEnergiModel(BaseModel):
         self.username = username
         self.api_key = api_key
 
+    @classmethod
+    def from_config(cls, section: Dict, **kwargs) -> 'MyEnergiModel':
+        return cls(section['username'], section['api-key'], **kwargs)
+
     @popup_on_error('Error initialising MyEnergi')
     def _connect(self):
+        from mec.zp import MyEnergiHost
         self.connection = MyEnergiHost(self.username, self.api_key)
 
     @popup_on_error('MyEnergi', cleanup_function=BaseModel._finish_refresh)
@@ -29,7 +33,6 @@ class MyEnergiModel(BaseModel):
             self.connection.refresh()
         self.update_properties()
 
-    @mainthread
     def _update_properties(self, data):
         self.car_charger_power = self.zappi.charge_rate
         self.immersion_power = self.eddi.charge_rate
@@ -63,10 +66,9 @@ class MyEnergiModel(BaseModel):
         with NoSSLVerification():
             data = self.connection.get_minute_data(serial, date.timetuple())
             hour_data = self.connection.get_hour_data(serial, date.timetuple())
-        timestamps, powers = history_dict_to_arrays(data)
-        mean_voltage_per_hour = {hour: np.mean([d['v1'] for d in data if d.get('hr', 0) == hour]) for hour in range(24)}
-        energies = hour_dict_to_energies(hour_data, mean_voltage_per_hour)
-        timestamps = timestamps.view(TimestampArray)
+        columns = decode_minute_data(data)
+        timestamps, powers = minute_columns_to_arrays(columns)
+        energies = hour_dict_to_energies(hour_data, hourly_mean_voltage(columns))
         output = powers
         output.update(energies)
         return timestamps, output
@@ -80,7 +82,12 @@ MY_ENERGI_NAME_MAPPING = {
 }
 
 
-def hour_dict_to_energies(hour_data: List[Dict], mean_voltage_per_hour: Dict):
+# fields of each get_minute_data entry. Fields with a value of zero are omitted from the entries,
+# including hr and min at the start of the day.
+MINUTE_DATA_FIELDS = ('yr', 'mon', 'dom', 'hr', 'min', 'v1', *MY_ENERGI_NAME_MAPPING.values())
+
+
+def hour_dict_to_energies(hour_data: List[Dict], mean_voltage_per_hour: np.ndarray):
     energies = {}
     for name, myenergi_name in MY_ENERGI_NAME_MAPPING.items():
         energies[name + '_energy'] = sum([datapoint.get(myenergi_name, 0)
@@ -91,32 +98,29 @@ def hour_dict_to_energies(hour_data: List[Dict], mean_voltage_per_hour: Dict):
     return energies
 
 
-def history_dict_to_arrays(zappi_data: List[Dict]):
-    timestamps = []
-    powers = {}
-    for name in MY_ENERGI_NAME_MAPPING:
-        powers[name] = []
-    volts = []
-    for datapoint in zappi_data:
-        # entries with zero value are omitted from data
-        timestamp = datetime.datetime(year=datapoint['yr'],
-                                      month=datapoint['mon'],
-                                      day=datapoint['dom'],
-                                      hour=datapoint.get('hr', 0),  # hr may not be present
-                                      minute=datapoint.get('min', 0),  # min may not be present
-                                      )
-        timestamps.append(timestamp)
-        volts.append(datapoint['v1'])
-        for name, myenergi_name in MY_ENERGI_NAME_MAPPING.items():
-            powers[name].append(datapoint.get(myenergi_name, 0))
-    timestamps = np.array(timestamps)
-    for name in MY_ENERGI_NAME_MAPPING:
-        powers[name] = np.array(powers[name], dtype=float)
-    volts = np.array(volts)/10
-    to_watts = 4/volts
-    for name in MY_ENERGI_NAME_MAPPING:
-        powers[name] *= to_watts
+def decode_minute_data(minute_data: List[Dict]) -> Dict[str, np.ndarray]:
+    """The columns of the minutes in ``minute_data`` that have a voltage, which the powers are computed from"""
+    rows = np.array([[datapoint.get(field, np.nan if field == 'v1' else 0) for field in MINUTE_DATA_FIELDS]
+                     for datapoint in minute_data],
+                    dtype=float).reshape(-1, len(MINUTE_DATA_FIELDS))
+    voltages = rows[:, MINUTE_DATA_FIELDS.index('v1')]
+    # a voltage that is missing (or zero, and so omitted) would give infinite powers
+    rows = rows[np.isfinite(voltages) & (voltages > 0)]
+    return dict(zip(MINUTE_DATA_FIELDS, rows.T))
+
+
+def hourly_mean_voltage(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    hours = columns['hr'].astype(int)
+    counts = np.bincount(hours, minlength=24)
+    totals = np.bincount(hours, weights=columns['v1'], minlength=24)
+    return np.divide(totals, counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+
+
+def minute_columns_to_arrays(columns: Dict[str, np.ndarray]):
+    timestamps = TimestampArray.from_components(columns['yr'], columns['mon'], columns['dom'],
+                                                columns['hr'], columns['min'])
+    volts = columns['v1'] / 10
+    to_watts = 4 / volts
+    powers = {name: columns[myenergi_name] * to_watts for name, myenergi_name in MY_ENERGI_NAME_MAPPING.items()}
     powers['total'] = powers['diverted'] + powers['imported']
-    for name in list(powers):
-        powers[name + '_power'] = powers.pop(name)
-    return timestamps, powers
+    return timestamps, {name + '_power': power for name, power in powers.items()}
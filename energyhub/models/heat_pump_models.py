@@ -2,16 +2,14 @@ import datetime
 from typing import Dict
 
 import numpy as np
-from kivy.clock import mainthread
 from kivy.properties import NumericProperty
 
-from ecoforest.ecoforest_processor import EcoforestClient
-from ecoforest.history_dataset import ChunkClass
 from .model import BaseModel
 from energyhub.utils import popup_on_error, TimestampArray
 
 
 class EcoforestModel(BaseModel):
+    vendor = 'Ecoforest'
     _heat_pump_power = NumericProperty(0)
     heating_power = NumericProperty(0)
     dhw_power = NumericProperty(0)
@@ -24,8 +22,13 @@ class EcoforestModel(BaseModel):
         self.serial_number = serial_number
         self.auth_key = auth_key
 
+    @classmethod
+    def from_config(cls, section: Dict, **kwargs) -> 'EcoforestModel':
+        return cls(section['server'], section['port'], section['serial-number'], section['auth-key'], **kwargs)
+
     @popup_on_error('Error initialising Ecoforest')
     def _connect(self):
+        from ecoforest.ecoforest_processor import EcoforestClient
         self.connection = EcoforestClient(self.server, self.port, self.serial_number, self.auth_key)
 
     @popup_on_error('Ecoforest', cleanup_function=BaseModel._finish_refresh)
@@ -33,7 +36,6 @@ class EcoforestModel(BaseModel):
         status = self.connection.get_current_status()
         self.update_properties(status)
 
-    @mainthread
     def _update_properties(self, status):
         self._heat_pump_power = status['ElectricalPower']['value']
         self.outside_temperature = status['OutsideTemp']['value']
@@ -50,8 +52,9 @@ class EcoforestModel(BaseModel):
             self.dhw_power = 0
 
     def _get_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
+        from ecoforest.history_dataset import ChunkClass
         raw_data = self.connection.get_history_for_date(date)
-        timestamps = np.array(raw_data.timestamps).view(TimestampArray)
+        timestamps = TimestampArray.from_datetimes(raw_data.timestamps)
         # multiply by 1000 to convert native kW to W
         data = {'outdoor_temp': raw_data.outdoor_temp,
                 'heating_power': raw_data.get_power_series(ChunkClass.heating_types()) * 1000,
@@ -1,40 +1,116 @@
 import datetime
+import functools
+import time
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict
+from collections import defaultdict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import numpy as np
-from kivy.clock import mainthread
+from kivy.clock import Clock, mainthread
 from kivy.event import EventDispatcher
-from kivy.properties import BooleanProperty
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, NumericProperty, StringProperty
+
+from energyhub.connection_gate import ConnectionGate
+from energyhub.future_registry import FutureRegistry
+from energyhub.history_cache import HistoryCache
+from energyhub.state_store import StateStore
+from energyhub.token_store import TokenStore
 
 
 class BaseModel(EventDispatcher, ABC):
     stale = BooleanProperty(True)
     refreshing = BooleanProperty(False)
-
-    def __init__(self, *args, **kwargs):
+    connecting = BooleanProperty(False)
+    # When the last successful refresh finished, in seconds since the epoch, or 0 if there has not been one
+    refreshed_at = NumericProperty(0)
+    # The vendor's name, for messages
+    vendor = ''
+    # Whether history fetches go through the history cache, for models whose history is not already on disk
+    cache_history = True
+
+    def __init__(self, *args, history_cache: HistoryCache = None, state_store: StateStore = None,
+                 executor: Executor = None, token_store: TokenStore = None,
+                 data_dir: str = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.connection = None
-        self.thread_pool = ThreadPoolExecutor(max_workers=2)
-        self.futures = {}
+        # usually an executor shared by all the models, but a model can have its own
+        self.thread_pool = ThreadPoolExecutor(max_workers=2) if executor is None else executor
+        # work submitted while connecting is held back until the connection has been made
+        self.connection_gate = ConnectionGate(self.thread_pool)
+        self.history_cache = history_cache
+        self._history_functions = set()
+        # the last result of each function but the history fetches, such as _refresh, is kept for get_result
+        self.futures = FutureRegistry(self.connection_gate,
+                                      group=lambda key: None if key[0] in self._history_functions else key[0])
+        self.connect_timeout = None
+        self.state_store = state_store
+        # for vendors that can log in again with saved tokens
+        self.token_store = token_store
+        # for any files that a model keeps for itself
+        self.data_dir = data_dir
+        if state_store is not None:
+            # the last known values, shown as stale until the first refresh
+            state_store.restore(self)
+
+    @classmethod
+    @abstractmethod
+    def from_config(cls, section: Dict, **kwargs) -> 'BaseModel':
+        """A model of the vendor in ``section`` of site_config.yml. ``kwargs`` are passed to `BaseModel`."""
+        raise NotImplementedError
+
+    @classmethod
+    def placeholder(cls, **kwargs) -> 'BaseModel':
+        """A model that is never connected, standing in for a vendor that is not in site_config.yml.
+
+        It shows the properties' defaults, so that the UI can bind to it as to any other model.
+        """
+        return cls.from_config(defaultdict(lambda: None), **kwargs)
 
-    def _run_in_model_thread(self, function: callable, *args):
-        self.futures[function.__name__, args] = self.thread_pool.submit(function, *args)
+    def _run_in_model_thread(self, function: callable, *args) -> Future:
+        return self.futures.submit((function.__name__, args), function, *args)
 
     def get_result(self, func_name, *args):
-        missing = 'MISSING'
-        future = self.futures.get(('_' + func_name, args), missing)
-        if future == missing:
-            future = self.futures[(func_name, args)]
+        future = self.futures.get(('_' + func_name, args), (func_name, args))
+        if future is None:
+            raise KeyError(f'No result available for {func_name}{args}')
         return future.result()
 
     def await_all(self):
-        for future in list(self.futures.values()):
+        for future in self.futures.values():
             future.result()
 
-    def connect(self):
-        self._run_in_model_thread(self._connect)
+    def connect(self, timeout: Optional[float] = None) -> Future:
+        """Start connecting on a model thread, without waiting for it.
+
+        Anything else submitted to the model threads is held back until the connection has been made,
+        but for no more than ``timeout`` seconds, after which it fails with a TimeoutError. A
+        connection that arrives later is still used by the requests that follow.
+        """
+        self.connecting = True
+        self.connect_timeout = timeout
+        self.connection_gate.close()
+        future = self.thread_pool.submit(self._connect)
+        future.add_done_callback(self._on_connected)
+        if timeout is not None:
+            Clock.schedule_once(lambda _: self._check_connected(future), timeout)
+        return future
+
+    def _on_connected(self, _):
+        self.connection_gate.open()
+        self._finish_connecting()
+
+    @mainthread
+    def _finish_connecting(self):
+        self.connecting = False
+
+    def _check_connected(self, future: Future):
+        if not future.done():
+            self.connecting = False
+            Logger.warning(f'EnergyHub: {self.vendor} has not connected within {self.connect_timeout:g} s')
+            self.connection_gate.fail(TimeoutError(f'{self.vendor} did not connect within '
+                                                   f'{self.connect_timeout:g} s'))
 
     @abstractmethod
     def _connect(self):
@@ -43,7 +119,15 @@ class BaseModel(EventDispatcher, ABC):
     def refresh(self):
         self.stale = True
         self.refreshing = True
-        self._run_in_model_thread(self._refresh)
+        future = self._run_in_model_thread(self._refresh)
+        future.add_done_callback(self._on_refresh_done)
+
+    @mainthread
+    def _on_refresh_done(self, future: Future):
+        # _refresh handles its own errors, so this only catches a refresh that gave up waiting to connect
+        if not future.cancelled() and future.exception() is not None:
+            Logger.warning(f'EnergyHub: {self.vendor} refresh failed: {future.exception()}')
+            self._finish_refresh()
 
     def _finish_refresh(self):
         self.refreshing = False
@@ -53,18 +137,50 @@ class BaseModel(EventDispatcher, ABC):
         raise NotImplementedError
 
     @abstractmethod
-    @mainthread
     def _update_properties(self, data):
+        """Set the properties from ``data``. Called on the main thread by ``update_properties``."""
         raise NotImplementedError
 
     @mainthread
     def update_properties(self, data=None):
         self._update_properties(data)
         self.stale = False
+        self.refreshed_at = time.time()
+        if self.state_store is not None:
+            self.state_store.save(self)
         self._finish_refresh()
 
-    def get_history_for_date(self, date: datetime.date, *args) -> (np.ndarray, Dict[str, np.ndarray]):
-        self._run_in_model_thread(self._get_history_for_date, date, *args)
+    def persisted_properties(self) -> List[str]:
+        """The names of the properties that hold the vendor's state, rather than the model's own."""
+        return sorted(name for name, prop in self.properties().items()
+                      if isinstance(prop, (NumericProperty, BooleanProperty, StringProperty))
+                      and name not in vars(BaseModel))
+
+    def _run_history_in_model_thread(self, function: callable, date: datetime.date, *args) -> Future:
+        self._history_functions.add(function.__name__)
+        return self._run_in_model_thread(self._with_history_cache(function), date, *args)
+
+    def cancel_history(self, keep_date: datetime.date = None) -> int:
+        # history keys are (function name, (date, *args))
+        return self.futures.cancel(lambda key: key[0] in self._history_functions and key[1][0] != keep_date)
+
+    def _with_history_cache(self, function: callable) -> callable:
+        if self.history_cache is None or not self.cache_history:
+            return function
+
+        # wraps keeps the function name, so results are still found by get_result
+        @functools.wraps(function)
+        def wrapper(date: datetime.date, *args):
+            model_name = self.__class__.__name__
+            result = self.history_cache.load(model_name, function.__name__, date, args)
+            if result is None:
+                result = function(date, *args)
+                self.history_cache.store(model_name, function.__name__, date, args, *result)
+            return result
+        return wrapper
+
+    def get_history_for_date(self, date: datetime.date, *args) -> Future:
+        return self._run_history_in_model_thread(self._get_history_for_date, date, *args)
 
     @abstractmethod
     def _get_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
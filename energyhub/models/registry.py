@@ -0,0 +1,30 @@
+import importlib
+from typing import Dict, NamedTuple, Type
+
+from energyhub.models.model import BaseModel
+
+
+class ModelEntry(NamedTuple):
+    """Where to find the model of a vendor, and the app property that holds it."""
+    app_property: str
+    module: str
+    class_name: str
+
+    def load(self) -> Type[BaseModel]:
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+# The model for each vendor, keyed by its section of site_config.yml. Their modules are only imported
+# when the app is built, even for unconfigured vendors, which get placeholders, and vendor SDKs only
+# when a model connects.
+MODEL_REGISTRY: Dict[str, ModelEntry] = {}
+
+
+def register_model(config_key: str, app_property: str, module: str, class_name: str):
+    MODEL_REGISTRY[config_key] = ModelEntry(app_property, module, class_name)
+
+
+register_model('solar-edge', 'solar_model', 'energyhub.models.solar_models', 'SolarEdgeModel')
+register_model('jlr', 'car_model', 'energyhub.models.car_models', 'JLRCarModel')
+register_model('ecoforest', 'heat_pump_model', 'energyhub.models.heat_pump_models', 'EcoforestModel')
+register_model('myenergi', 'diverter_model', 'energyhub.models.diverter_models', 'MyEnergiModel')
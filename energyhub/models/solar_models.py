@@ -1,17 +1,18 @@
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Dict
 
 import numpy as np
-from kivy.clock import mainthread
 from kivy.properties import NumericProperty, BooleanProperty, StringProperty, AliasProperty
 
 from .model import BaseModel
 from energyhub.utils import popup_on_error, TimestampArray
-from solaredge import SolarEdgeClient
 
 
 class SolarEdgeModel(BaseModel):
 
+    vendor = 'SolarEdge'
+
     solar_production = NumericProperty(0)
     battery_production = NumericProperty(4)
     grid_power = NumericProperty(0)
@@ -25,8 +26,13 @@ class SolarEdgeModel(BaseModel):
         self.api_key = api_key
         self.site_id = site_id
 
+    @classmethod
+    def from_config(cls, section: Dict, **kwargs) -> 'SolarEdgeModel':
+        return cls(section['api-key'], section['site-id'], **kwargs)
+
     @popup_on_error('Error initialising SolarEdge')
     def _connect(self):
+        from solaredge import SolarEdgeClient
         self.connection = SolarEdgeClient(self.api_key,
                                           self.site_id)
 
@@ -35,7 +41,6 @@ class SolarEdgeModel(BaseModel):
         power_flow_data = self.connection.get_power_flow()
         self.update_properties(power_flow_data)
 
-    @mainthread
     def _update_properties(self, power_flow_data):
         if power_flow_data['unit'] == 'kW':
             conversion_factor = 1000
@@ -52,7 +57,7 @@ class SolarEdgeModel(BaseModel):
     def _get_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
         data = self.connection.get_power_history_for_day(date)
         data['export'] = data.pop('FeedIn')
-        timestamps = data.pop('timestamps').view(TimestampArray)
+        timestamps = TimestampArray.from_datetimes(data.pop('timestamps'))
         energy_data = self.connection.get_energy_for_day(date)
         energy_data['export'] = energy_data.pop('FeedIn')
         energy_data = {k+'_energy': v for k, v in energy_data.items()}
@@ -60,12 +65,12 @@ class SolarEdgeModel(BaseModel):
         data = {k.lower(): v for k, v in data.items()}
         return timestamps, data
 
-    def get_battery_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
-        self._run_in_model_thread(self._get_battery_history_for_date, date)
+    def get_battery_history_for_date(self, date: datetime.date) -> Future:
+        return self._run_history_in_model_thread(self._get_battery_history_for_date, date)
 
     def _get_battery_history_for_date(self, date: datetime.date) -> (np.ndarray, Dict[str, np.ndarray]):
         data = self.connection.get_battery_history_for_day(date)
-        timestamps = data.pop('timestamps').view(TimestampArray)
+        timestamps = TimestampArray.from_datetimes(data.pop('timestamps'))
         return timestamps, data
 
     def _get_battery_color(self):
@@ -0,0 +1,144 @@
+"""
+Main-thread stall measurement, and a start-up profiler for the app.
+
+The profiler reports an import-time breakdown, from ``python -X importtime``, and the time from
+launching the app to its first frame. Run it from the repository root, where site_config.yml is, with::
+
+    python -m energyhub.profiling [--module MODULE] [--top N] [--runs N] [--headless]
+
+``--headless`` uses Kivy's mock GL backend, so that it runs without a display, e.g. in CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+from kivy.clock import Clock
+
+FIRST_FRAME_MARKER = 'energyhub-first-frame'
+
+
+class StallMonitor:
+    """Records the longest gap between consecutive frames, i.e. the longest main-thread stall."""
+
+    def __init__(self):
+        self.max_stall = 0.
+        self._last_frame = None
+        self._event = None
+
+    def start(self):
+        self._last_frame = time.perf_counter()
+        self._event = Clock.schedule_interval(self._on_frame, 0)
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def reset(self) -> float:
+        """Return the longest stall since the last reset, in seconds, and start again."""
+        max_stall, self.max_stall = self.max_stall, 0.
+        return max_stall
+
+    def _on_frame(self, _):
+        now = time.perf_counter()
+        self.max_stall = max(self.max_stall, now - self._last_frame)
+        self._last_frame = now
+
+
+def report_first_frame(app):
+    """Print the time of the first frame that ``app`` draws, and then stop it."""
+    from kivy.core.window import Window
+
+    def on_flip(window):
+        window.unbind(on_flip=on_flip)
+        print(f'{FIRST_FRAME_MARKER} {time.time():.6f}', flush=True)
+        app.stop()
+    Window.bind(on_flip=on_flip)
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """The entries of ``python -X importtime`` output, in the order they are printed."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append(ImportTime(name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def time_imports(module: str, env: Dict[str, str]) -> List[ImportTime]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def time_first_frame(env: Dict[str, str], timeout: float = 120) -> float:
+    """Seconds from launching the app to its first frame, including interpreter start-up."""
+    env = dict(env, ENERGYHUB_PROFILE_STARTUP='1')
+    start = time.time()
+    process = subprocess.Popen([sys.executable, 'main.py'], env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    watchdog = threading.Timer(timeout, process.kill)
+    watchdog.start()
+    try:
+        for line in process.stdout:
+            if line.startswith(FIRST_FRAME_MARKER):
+                return float(line.split()[1]) - start
+    finally:
+        watchdog.cancel()
+        # vendor connections may still be in flight, and are of no interest here
+        process.kill()
+        process.wait()
+    raise RuntimeError('The app exited without drawing a frame')
+
+
+def print_import_breakdown(entries: List[ImportTime], top: int):
+    by_package = defaultdict(int)
+    for entry in entries:
+        by_package[entry.module.split('.')[0]] += entry.self_us
+    total = sum(by_package.values())
+    print(f'Imports: {total / 1000:.0f} ms in total')
+    print(f'{"package":<30} {"ms":>8} {"share":>6}')
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f'{package:<30} {self_us / 1000:8.1f} {self_us / total:6.1%}')
+    print()
+    print('Slowest imports, including what they import')
+    print(f'{"module":<50} {"ms":>8}')
+    for entry in sorted(entries, key=lambda entry: -entry.cumulative_us)[:top]:
+        print(f'{entry.module:<50} {entry.cumulative_us / 1000:8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='energyhub.kivy_hub', help='module whose imports are timed')
+    parser.add_argument('--top', type=int, default=15, help='number of packages and modules to list')
+    parser.add_argument('--runs', type=int, default=3, help='launches to time the first frame over')
+    parser.add_argument('--headless', action='store_true', help="use Kivy's mock GL backend")
+    args = parser.parse_args()
+
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1')
+    if args.headless:
+        env['KIVY_GL_BACKEND'] = 'mock'
+    print_import_breakdown(time_imports(args.module, env), args.top)
+    print()
+    times = sorted(time_first_frame(env) for _ in range(args.runs))
+    print(f'First frame: {1000 * times[len(times) // 2]:.0f} ms median, '
+          f'{1000 * times[0]:.0f}-{1000 * times[-1]:.0f} ms over {args.runs} runs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import datetime
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+
+from energyhub.utils import TimestampArray
+
+# no UTC offset is larger than this, so the samples of a local day are within it of the UTC day
+MAX_UTC_OFFSET = 14 * 60 * 60
+
+
+class SampleLog:
+    """An append-only log of samples, stored as raw records of the structured ``dtype``.
+
+    The first field of ``dtype`` must be ``time``, in seconds since the epoch, and samples are only
+    appended in time order, so that the samples of a day can be found by a binary search of a memory
+    map of the file, without reading the rest of it. A partial record left at the end by an
+    interrupted write is ignored by ``read``, and cut off when the log is opened, so that later
+    records are appended after the last whole one.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype):
+        if dtype.names[0] != 'time':
+            raise ValueError(f'The first field of a SampleLog must be time, not {dtype.names[0]}')
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._drop_partial_record()
+        samples = self.read()
+        self.last_time = samples['time'][-1] if samples.size else None
+
+    def append(self, sample: Dict) -> bool:
+        """Add ``sample``, returning False if it is no newer than the last, and so was not added."""
+        record = np.array(tuple(sample[name] for name in self.dtype.names), dtype=self.dtype)
+        with self._lock:
+            if self.last_time is not None and record['time'] <= self.last_time:
+                return False
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'ab') as file:
+                file.write(record.tobytes())
+            self.last_time = record['time']
+        return True
+
+    def _drop_partial_record(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size % self.dtype.itemsize:
+            os.truncate(self.path, size - size % self.dtype.itemsize)
+
+    def read(self) -> np.ndarray:
+        """Every sample, as a read-only memory map of the file."""
+        try:
+            n_samples = os.path.getsize(self.path) // self.dtype.itemsize
+        except OSError:
+            n_samples = 0
+        if n_samples == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', shape=(n_samples,))
+
+    def read_date(self, date: datetime.date) -> np.ndarray:
+        """A copy of the samples taken on ``date``, in local time."""
+        samples = self.read()
+        utc_start = (date - datetime.date(1970, 1, 1)).days * 24 * 60 * 60
+        bounds = np.searchsorted(samples['time'], [utc_start - MAX_UTC_OFFSET,
+                                                   utc_start + 24 * 60 * 60 + MAX_UTC_OFFSET])
+        nearby = samples[bounds[0]:bounds[1]]
+        # the day is cut in the wall-clock times that the graphs use, so they always agree on it
+        return np.array(nearby[TimestampArray.from_epoch(nearby['time']).day_slice(date)])
@@ -0,0 +1,154 @@
+import datetime
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+class SnapshotCache:
+    """Rendered history graphs, as RGBA arrays keyed by ``(date, graph kind, pixel size, dpi)``.
+
+    Recently used images are kept in memory, up to ``max_bytes``. Images of days that are closed
+    (over, plus ``settle_time`` for late vendor uploads) are also written to PNG files under
+    ``directory`` in the background as they are added, so that they last between runs. The files are
+    pruned to ``max_disk_bytes``. Images of open days stay in memory, and are dropped by
+    ``invalidate_open`` when new data arrives. Each call to that starts a new ``generation``, and open
+    days rendered from the data of an earlier one are not added.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 2**20, max_disk_bytes: int = 256 * 2**20,
+                 settle_time: datetime.timedelta = datetime.timedelta(hours=1)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.settle_time = settle_time
+        self.hits = 0
+        self.misses = 0
+        self._images: Dict[Hashable, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def _key(date: datetime.date, kind: str, size: Tuple[int, int], dpi: float) -> Tuple:
+        return date, kind, tuple(size), float(dpi)
+
+    def _path(self, key: Tuple) -> str:
+        date, kind, (width, height), dpi = key
+        return os.path.join(self.directory, f'{date.isoformat()}_{kind}_{width}x{height}_{dpi:g}.png')
+
+    def is_closed(self, date: datetime.date) -> bool:
+        end_of_day = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time(0))
+        return datetime.datetime.now() >= end_of_day + self.settle_time
+
+    def get(self, date: datetime.date, kind: str, size: Tuple[int, int], dpi: float) -> Optional[np.ndarray]:
+        key = self._key(date, kind, size, dpi)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+        image = self._load(key)
+        with self._lock:
+            if image is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._add(key, image)
+        return image
+
+    def put(self, date: datetime.date, kind: str, size: Tuple[int, int], dpi: float, image: np.ndarray,
+            generation: int = None):
+        """Add ``image``, rendered from data fetched in ``generation`` (default: the current one)."""
+        key = self._key(date, kind, size, dpi)
+        closed = self.is_closed(date)
+        with self._lock:
+            if not closed and generation is not None and generation != self.generation:
+                # the data was fetched before the last invalidate_open, so is out of date
+                return
+            self._add(key, image)
+        if closed:
+            self._writer.submit(self._write_and_prune, key, image)
+
+    def invalidate_open(self):
+        """Forget every image of a day that is not yet closed."""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._images if not self.is_closed(key[0])]:
+                self._bytes -= self._images.pop(key).nbytes
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._images),
+                    'bytes': self._bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    }
+
+    def _add(self, key: Tuple, image: np.ndarray):
+        """Add an image, evicting the least recently used to make room for it. Must be called with the lock held."""
+        previous = self._images.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._images[key] = image
+        self._bytes += image.nbytes
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            _, old_image = self._images.popitem(last=False)
+            self._bytes -= old_image.nbytes
+
+    def _write_and_prune(self, key: Tuple, image: np.ndarray):
+        if self._write(key, image):
+            self._prune_disk()
+
+    def _write(self, key: Tuple, image: np.ndarray) -> bool:
+        path = self._path(key)
+        if os.path.exists(path):
+            return False
+        from PIL import Image
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first, so that a reader never sees a partial image
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            # a low compression level, as the images are only read back on this device
+            Image.fromarray(image).save(temp_path, format='png', compress_level=1)
+            os.replace(temp_path, path)
+        except OSError:
+            return False
+        return True
+
+    def _load(self, key: Tuple) -> Optional[np.ndarray]:
+        if not self.is_closed(key[0]):
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                return np.asarray(image.convert('RGBA'))
+        except (OSError, ValueError):
+            # a truncated or otherwise unreadable image is treated as a miss, and will be overwritten
+            return None
+
+    def _prune_disk(self):
+        entries = []
+        with os.scandir(self.directory) as files:
+            for entry in files:
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
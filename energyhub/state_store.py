@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+from typing import Dict
+
+
+class StateStore:
+    """The last known state of each model, kept in one small JSON file.
+
+    After each successful refresh a model's ``persisted_properties`` are saved, with the time of the
+    refresh, under the model's class name. They are restored when the model is created, so that the
+    dashboard shows the last real values, marked as stale, rather than placeholders until the first
+    refresh arrives.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._states = self._read()
+        self._lock = threading.Lock()
+
+    def restore(self, model) -> bool:
+        """Set the saved properties on ``model``, returning whether there were any."""
+        state = self._states.get(type(model).__name__)
+        if not isinstance(state, dict):
+            return False
+        persisted = model.persisted_properties()
+        for name, value in state.get('properties', {}).items():
+            if name not in persisted:
+                continue
+            try:
+                setattr(model, name, value)
+            except ValueError:
+                # the property has changed type since it was saved
+                continue
+        model.refreshed_at = state.get('refreshed_at', 0)
+        return True
+
+    def save(self, model):
+        state = {'refreshed_at': model.refreshed_at,
+                 'properties': {name: getattr(model, name) for name in model.persisted_properties()},
+                 }
+        with self._lock:
+            self._states[type(model).__name__] = state
+            self._write(self._states)
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as file:
+                states = json.load(file)
+        except (OSError, ValueError):
+            # a missing or unreadable file just means that there is no state to restore
+            return {}
+        return states if isinstance(states, dict) else {}
+
+    def _write(self, states: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # write to a temporary file first, so that a reader never sees a partial file
+        temp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(states, file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
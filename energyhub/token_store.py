@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+
+class TokenStore:
+    """Vendor login tokens, kept between runs in a JSON file that only the user can read.
+
+    Each model saves its tokens under its own key, such as the account name, so that a later run can
+    log in again with them rather than with the password.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tokens = self._read()
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[Dict]:
+        tokens = self._tokens.get(key)
+        return tokens if isinstance(tokens, dict) else None
+
+    def save(self, key: str, tokens: Dict):
+        with self._lock:
+            if self._tokens.get(key) == tokens:
+                return
+            self._tokens[key] = tokens
+            self._write(self._tokens)
+
+    def clear(self, key: str):
+        with self._lock:
+            if self._tokens.pop(key, None) is not None:
+                self._write(self._tokens)
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as file:
+                tokens = json.load(file)
+        except (OSError, ValueError):
+            # a missing or unreadable file just means logging in with the password
+            return {}
+        return tokens if isinstance(tokens, dict) else {}
+
+    def _write(self, tokens: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # the temporary file is created readable by the user alone, so the tokens are never exposed
+        temp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        try:
+            descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(tokens, file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
@@ -50,9 +50,7 @@ def _warning(title: str, msg: str):
 
 
 def timestamps_to_hours(times: Sequence[datetime.datetime]):
-    date = times[0].date()
-    midnight = datetime.datetime.combine(date, datetime.time(0))
-    return np.array([(t - midnight).total_seconds() / (60 * 60) for t in times])
+    return TimestampArray.from_datetimes(times).total_hours()
 
 
 # noinspection PyUnresolvedReferences,PyProtectedMember
@@ -67,26 +65,210 @@ class NoSSLVerification(AbstractContextManager):
 
 
 class TimestampArray(np.ndarray):
-    def total_hours(self):
-        return timestamps_to_hours(self)
+    """Local wall-clock timestamps, stored as ``datetime64[s]``.
+
+    Create with one of the ``from_*`` class methods, rather than by viewing an arbitrary array.
+    """
+    DTYPE = np.dtype('datetime64[s]')
+
+    @classmethod
+    def from_datetimes(cls, times, tz: datetime.tzinfo = None) -> 'TimestampArray':
+        """Timezone-aware datetimes are converted to wall-clock time in ``tz`` (default: local time)."""
+        times = np.asarray(times)
+        if times.dtype == object and times.size and getattr(times.flat[0], 'tzinfo', None) is not None:
+            times = np.array([t.astimezone(tz).replace(tzinfo=None) for t in times.flat])
+        return np.asarray(times, dtype=cls.DTYPE).view(cls)
+
+    @classmethod
+    def from_components(cls, year, month, day, hour=0, minute=0, second=0) -> 'TimestampArray':
+        year, month, day, hour, minute, second = (np.asarray(x, dtype=np.int64)
+                                                  for x in (year, month, day, hour, minute, second))
+        months = (year - 1970) * 12 + (month - 1)
+        days = months.astype('datetime64[M]').astype('datetime64[D]') + (day - 1)
+        seconds = hour * 3600 + minute * 60 + second
+        return (days.astype(cls.DTYPE) + seconds.astype('timedelta64[s]')).view(cls)
+
+    @classmethod
+    def from_epoch(cls, seconds, tz: datetime.tzinfo = None) -> 'TimestampArray':
+        """Convert POSIX times to wall-clock time in ``tz`` (default: local time), including DST."""
+        seconds = np.asarray(seconds, dtype=np.int64)
+        # UTC offsets only change on the hour, so only need looking up once per distinct hour
+        hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+        epoch = datetime.datetime(1970, 1, 1)
+        offsets = np.array([(datetime.datetime.fromtimestamp(hour * 3600, tz).replace(tzinfo=None)
+                             - (epoch + datetime.timedelta(hours=int(hour)))).total_seconds()
+                            for hour in hours], dtype=np.int64)
+        local_seconds = seconds + offsets[inverse].reshape(seconds.shape)
+        return local_seconds.astype(cls.DTYPE).view(cls)
+
+    @property
+    def midnight(self) -> np.datetime64:
+        return self.view(np.ndarray)[0].astype('datetime64[D]').astype(self.DTYPE)
+
+    def total_hours(self) -> np.ndarray:
+        """Hours since midnight on the day of the first timestamp.
+
+        As the timestamps are wall-clock times, these are the hours shown on a clock, so days with
+        a DST change run from 0 to 24 as any other.
+        """
+        if self.size == 0:
+            return np.array([], dtype=float)
+        return (self.view(np.ndarray) - self.midnight) / np.timedelta64(1, 'h')
+
+    def day_slice(self, date: datetime.date) -> slice:
+        """The slice of this (sorted) array, and of any data sampled with it, that falls on ``date``.
+
+        The day runs from midnight to midnight on the clock, so has 23 or 25 hours across a DST change.
+        """
+        start = np.datetime64(date, 'D').astype(self.DTYPE).astype(np.int64)
+        seconds = self.view(np.ndarray).view(np.int64)
+        bounds = np.searchsorted(seconds, [start, start + 24 * 60 * 60])
+        return slice(int(bounds[0]), int(bounds[1]))
+
+
+class Resampler:
+    """Averages (or otherwise aggregates) data sampled at ``data_ts`` into the bins of ``ref_ts``.
+
+    The bin plan is computed once on construction, and can then be applied to any number of series
+    sampled at ``data_ts``, either singly or stacked as a 2-D ``(n_series, n_samples)`` array.
+    """
+    AGGREGATIONS = ('mean', 'sum', 'last', 'time_weighted')
+
+    def __init__(self, ref_ts: TimestampArray, data_ts: TimestampArray, mode: str = 'preceding'):
+        ref_hours = ref_ts.total_hours()
+        data_hours = data_ts.total_hours()
+        if mode == 'midpoint':
+            bin_edges = np.mean(np.vstack((ref_hours[:-1], ref_hours[1:])), axis=0)
+        elif mode == 'preceding':
+            bin_edges = ref_hours[1:]
+        elif mode == 'following':
+            bin_edges = ref_hours[:-1]
+        else:
+            raise ValueError(f'Unknown mode: {mode}')
+        self.n_bins = ref_ts.size
+        # 0 and max(data) are implicit bin_edges in np.digitize
+        self.bin_indices = np.digitize(data_hours, bin_edges)
+        self.counts = np.bincount(self.bin_indices, minlength=self.n_bins)
+        self.last_indices = np.full(self.n_bins, -1)
+        np.maximum.at(self.last_indices, self.bin_indices, np.arange(data_hours.size))
+        # each sample is taken to last until the next one, and the final one for the typical interval
+        durations = np.diff(data_hours)
+        self.durations = np.append(durations, np.median(durations) if durations.size else 0)[:data_hours.size]
+        self.duration_per_bin = np.bincount(self.bin_indices, weights=self.durations, minlength=self.n_bins)
+
+    def resample(self, data: np.ndarray, how: str = 'mean', fill=0.):
+        """Aggregate ``data`` into the reference bins.
+
+        ``fill`` is used for bins that contain no samples: either a value, or ``'previous'`` to
+        carry the last non-empty bin forward.
+        """
+        data = np.asarray(data, dtype=float)
+        stack = np.atleast_2d(data)
+        n_series = stack.shape[0]
+        if stack.shape[1] == 0:
+            # a vendor with no data for the day: every bin is empty, and there is nothing to carry forward
+            result = np.full((n_series, self.n_bins), 0. if fill == 'previous' else fill)
+            return result[0] if data.ndim == 1 else result
+        empty = self.counts == 0
+        if how == 'last':
+            result = stack[:, self.last_indices]
+        elif how in ('mean', 'sum', 'time_weighted'):
+            weights = stack * self.durations if how == 'time_weighted' else stack
+            flat_indices = (self.bin_indices + self.n_bins * np.arange(n_series)[:, np.newaxis]).ravel()
+            result = np.bincount(flat_indices, weights=weights.ravel(),
+                                 minlength=n_series * self.n_bins).reshape(n_series, self.n_bins)
+            if how == 'mean':
+                np.divide(result, self.counts, out=result, where=~empty)
+            elif how == 'time_weighted':
+                empty = self.duration_per_bin == 0
+                np.divide(result, self.duration_per_bin, out=result, where=~empty)
+        else:
+            raise ValueError(f'Unknown aggregation: {how}. Must be one of {self.AGGREGATIONS}')
+
+        if fill == 'previous':
+            if empty.all():
+                result[:] = 0
+            else:
+                source_bins = np.where(empty, 0, np.arange(self.n_bins))
+                np.maximum.accumulate(source_bins, out=source_bins)
+                first_filled_bin = np.argmin(empty)
+                source_bins[:first_filled_bin] = first_filled_bin
+                result = result[:, source_bins]
+        else:
+            result[:, empty] = fill
+        return result[0] if data.ndim == 1 else result
 
 
 def normalise_to_timestamps(ref_ts: TimestampArray, data_ts: TimestampArray, data: np.ndarray,
                             mode: str = 'preceding'):
-    ref_hours = ref_ts.total_hours()
-    data_hours = data_ts.total_hours()
-    if mode == 'midpoint':
-        bin_edges = np.mean(np.vstack((ref_hours[:-1], ref_hours[1:])), axis=0)
-    elif mode == 'preceding':
-        bin_edges = ref_hours[1:]
-    elif mode == 'following':
-        bin_edges = ref_hours[:-1]
-    # 0 and max(data) are implicit bin_edges in np.digitize
-    bin_indices = np.digitize(data_hours, bin_edges)
-    counts_per_bin = np.bincount(bin_indices, minlength=ref_ts.size)
-    total_data_in_bin = np.bincount(bin_indices, weights=data, minlength=ref_ts.size)
-    mean_data_in_bin = total_data_in_bin / counts_per_bin
-    return mean_data_in_bin
+    return Resampler(ref_ts, data_ts, mode).resample(data)
+
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+
+def _bucket_order(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Indices of ``values``, sorted by bucket (``edges`` being the bucket starts, then the end) and then by value."""
+    buckets = np.repeat(np.arange(edges.size - 1), np.diff(edges))
+    return np.lexsort((values, buckets))
+
+
+def min_max_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the minimum and maximum of ``y`` in each of ``n_out / 2`` equal buckets, plus the end points.
+
+    Every peak and trough survives, so this is the safer choice for powers.
+    """
+    n = y.size
+    if n_out >= n:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    order = _bucket_order(np.nan_to_num(y), edges)
+    # sorted within each bucket, so the minimum comes first and the maximum last
+    return np.unique(np.concatenate(([0], order[edges[:-1]], order[edges[1:] - 1], [n - 1])))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of ``n_out`` points of ``(x, y)`` chosen by Largest-Triangle-Three-Buckets.
+
+    The end points are kept, and the rest are split into ``n_out - 2`` buckets. From each bucket the
+    point making the largest triangle with its neighbouring buckets is kept. Classic LTTB uses the point
+    just chosen from the previous bucket as one corner, which makes it sequential. Here the previous
+    bucket's mean is used instead, as for the next bucket, so that every bucket is handled at once.
+    """
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    n_buckets = n_out - 2
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(int)
+    counts = np.diff(edges)
+    buckets = np.repeat(np.arange(n_buckets), counts)
+    inner_x = x[1:-1]
+    inner_y = np.nan_to_num(y[1:-1])
+    mean_x = np.bincount(buckets, inner_x, minlength=n_buckets) / counts
+    mean_y = np.bincount(buckets, inner_y, minlength=n_buckets) / counts
+    previous_x = np.concatenate(([x[0]], mean_x[:-1]))[buckets]
+    previous_y = np.concatenate(([np.nan_to_num(y[0])], mean_y[:-1]))[buckets]
+    next_x = np.concatenate((mean_x[1:], [x[-1]]))[buckets]
+    next_y = np.concatenate((mean_y[1:], [np.nan_to_num(y[-1])]))[buckets]
+    # twice the triangle area, which is enough for comparisons
+    areas = np.abs((previous_x - next_x) * (inner_y - previous_y)
+                   - (previous_x - inner_x) * (next_y - previous_y))
+    # the largest area is last in each bucket
+    order = _bucket_order(areas, edges - 1)
+    return np.concatenate(([0], order[edges[1:] - 2] + 1, [n - 1]))
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n_out: int, method: str = 'minmax') -> np.ndarray:
+    """Sorted indices of about ``n_out`` points that represent ``(x, y)``, or all of them if there are no more.
+
+    ``method`` is 'minmax' (which keeps every peak) or 'lttb' (which best preserves the shape).
+    """
+    if method == 'minmax':
+        return min_max_indices(y, n_out)
+    elif method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f'Unknown downsampling method: {method}. Must be one of {DOWNSAMPLE_METHODS}')
 
 
 class IconButton(ButtonBehavior, Image):
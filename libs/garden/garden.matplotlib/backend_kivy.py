@@ -299,12 +299,15 @@ from distutils.version import LooseVersion
 
 _mpl_ge_1_5 = LooseVersion(matplotlib.__version__) >= LooseVersion('1.5.0')
 _mpl_ge_2_0 = LooseVersion(matplotlib.__version__) >= LooseVersion('2.0.0')
+_mpl_ge_3_3 = LooseVersion(matplotlib.__version__) >= LooseVersion('3.3.0')
+_mpl_ge_3_6 = LooseVersion(matplotlib.__version__) >= LooseVersion('3.6.0')
 
 import numpy as np
 import io
 import textwrap
 import uuid
 import numbers
+from collections import OrderedDict
 from functools import partial
 from math import cos, sin, pi
 
@@ -386,6 +389,138 @@ def new_figure_manager_given_figure(num, figure):
     return manager
 
 
+def font_key(prop):
+    '''A hashable key of everything in the FontProperties prop that affects
+       how text is drawn. The properties' own hash is not used, as strings
+       in fonts whose hashes collide would share cache entries.
+    '''
+    return (tuple(prop.get_family()), prop.get_style(), prop.get_variant(),
+            prop.get_weight(), prop.get_stretch(), prop.get_size_in_points(),
+            prop.get_file(), getattr(prop, 'get_math_fontfamily', lambda: None)())
+
+
+class TextCache(object):
+    '''A bounded least-recently-used cache of text layout results, with
+       counters of hits and misses. Keys are built by `RendererKivy` from
+       the string, the font properties and the dpi.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.,
+                }
+
+
+# Mesh indices are unsigned shorts, so each Mesh can address this many vertices
+MAX_MESH_VERTICES = 65535
+
+
+def fill_triangles(points):
+    '''Tessellate the polygon whose vertices are in the flat list *points*
+       and return its vertices, as x, y, u, v, and its triangle indices, or
+       None if the tessellation failed.
+    '''
+    tess = Tesselator()
+    tess.add_contour(points)
+    if not tess.tesselate():
+        return None
+    vertices = []
+    indices = []
+    for fan_vertices, fan_indices in tess.meshes:
+        # the Tesselator gives triangle fans, already in the Mesh format
+        start = len(vertices) // 4
+        vertices.extend(fan_vertices)
+        for i in range(start + 1, start + len(fan_indices) - 1):
+            indices.extend((start, i, i + 1))
+    return vertices, indices
+
+
+def stroke_meshes(polylines, half_width):
+    '''Yield the vertices and indices of Meshes that draw a quad of half
+       width *half_width* along each segment of every polyline in the list
+       *polylines* of (n, 2) arrays.
+    '''
+    points = np.concatenate(polylines)
+    # segments join consecutive points, but not the end of one polyline to the next
+    is_start = np.ones(len(points), dtype=bool)
+    is_start[np.cumsum([len(polyline) for polyline in polylines]) - 1] = False
+    starts = points[is_start]
+    directions = points[1:][is_start[:-1]] - starts
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    keep = lengths > 0
+    starts, directions = starts[keep], directions[keep]
+    normals = directions[:, ::-1] * (-1, 1) * (half_width / lengths[keep])[:, None]
+    ends = starts + directions
+    corners = np.stack((starts + normals, starts - normals,
+                        ends - normals, ends + normals), axis=1)
+    quads_per_mesh = MAX_MESH_VERTICES // 4
+    for first in range(0, len(corners), quads_per_mesh):
+        chunk = corners[first:first + quads_per_mesh].reshape(-1, 2)
+        vertices = np.zeros((len(chunk), 4))
+        vertices[:, :2] = chunk
+        quads = 4 * np.arange(len(chunk) // 4)[:, None]
+        indices = np.concatenate((quads + (0, 1, 2), quads + (0, 2, 3)), axis=1)
+        yield vertices.ravel().tolist(), indices.ravel().tolist()
+
+
+class MeshBatch(object):
+    '''Triangles grouped by a key, such as a target widget and a colour,
+       to be drawn with as few Mesh instructions as possible. A new Mesh is
+       started where one would exceed the vertices its indices can address.
+    '''
+    def __init__(self):
+        self._groups = OrderedDict()
+
+    def add(self, key, vertices, indices):
+        '''Add triangles, with *vertices* a flat list of x, y, u, v and
+           *indices* counting from the first of them.
+        '''
+        meshes = self._groups.setdefault(key, [([], [])])
+        mesh_vertices, mesh_indices = meshes[-1]
+        if mesh_vertices and (len(mesh_vertices) + len(vertices)) // 4 > MAX_MESH_VERTICES:
+            mesh_vertices, mesh_indices = [], []
+            meshes.append((mesh_vertices, mesh_indices))
+        start = len(mesh_vertices) // 4
+        mesh_vertices.extend(vertices)
+        mesh_indices.extend([start + i for i in indices])
+
+    def meshes(self):
+        '''Yield (key, vertices, indices) for each Mesh.'''
+        for key, meshes in self._groups.items():
+            for vertices, indices in meshes:
+                yield key, vertices, indices
+
+
 class RendererKivy(RendererBase):
     '''The kivy renderer handles drawing/rendering operations. A RendererKivy
        should be initialized with a FigureCanvasKivy widget. On initialization
@@ -394,14 +529,22 @@ class RendererKivy(RendererBase):
        is defined for elements that need to be clipped inside a rectangle such
        as axes. The rest of the render is performed using kivy graphics
        instructions.
+
+       Text extents and rendered text textures are kept in class-level
+       caches shared by every renderer, as tick labels and legend entries
+       repeat on every draw and every figure.
     '''
+    text_extents = TextCache(1024)
+    text_textures = TextCache(512)
+
     def __init__(self, widget):
         super(RendererKivy, self).__init__()
         self.widget = widget
         self.dpi = widget.figure.dpi
         self._markers = {}
         #  Can be enhanced by using TextToPath matplotlib, textpath.py
-        self.mathtext_parser = MathTextParser("Bitmap")
+        # the Bitmap output was removed in matplotlib 3.6, in favour of agg
+        self.mathtext_parser = MathTextParser("agg" if _mpl_ge_3_6 else "Bitmap")
         self.list_goraud_triangles = []
         self.clip_rectangles = []
         self.labels_inside_plot = []
@@ -450,7 +593,7 @@ class RendererKivy(RendererBase):
     def draw_path_collection(self, gc, master_transform, paths, all_transforms,
         offsets, offsetTrans, facecolors, edgecolors,
         linewidths, linestyles, antialiaseds, urls,
-        offset_position):
+        offset_position, **kwargs):
         '''Draws a collection of paths selecting drawing properties from
            the lists *facecolors*, *edgecolors*, *linewidths*,
            *linestyles* and *antialiaseds*. *offsets* is a list of
@@ -458,44 +601,69 @@ class RendererKivy(RendererBase):
            *offsets* are first transformed by *offsetTrans* before being
            applied.  *offset_position* may be either "screen" or "data"
            depending on the space that the offsets are in.
+
+           Rather than an instruction group per path, the fills and strokes
+           of every path are tessellated into triangles and combined into one
+           Mesh per clip area and colour, so the number of instructions does
+           not grow with the number of paths. Strokes are drawn as solid quads
+           along each segment, without joins, so thick edges show notches at
+           their corners. Collections with dashed edges are drawn path by
+           path instead, as the quads cannot show dashes.
         '''
-        len_path = len(paths[0].vertices) if len(paths) > 0 else 0
-        uses_per_path = self._iter_collection_uses_per_path(
-            paths, all_transforms, offsets, facecolors, edgecolors)
-        # check whether an optimization is needed by calculating the cost of
-        # generating and use a path with the cost of emitting a path in-line.
-        should_do_optimization = \
-            len_path + uses_per_path + 5 < len_path * uses_per_path
-        if not should_do_optimization:
+        if any(dashes is not None for _, dashes in linestyles) and len(edgecolors):
             return RendererBase.draw_path_collection(
                 self, gc, master_transform, paths, all_transforms,
                 offsets, offsetTrans, facecolors, edgecolors,
                 linewidths, linestyles, antialiaseds, urls,
-                offset_position)
-        # Generate an array of unique paths with the respective transformations
+                offset_position, **kwargs)
+        # the polygons of each unique path, before the offsets are applied
         path_codes = []
-        for i, (path, transform) in enumerate(self._iter_collection_raw_paths(
-            master_transform, paths, all_transforms)):
-            transform = Affine2D(transform.get_matrix()).scale(1.0, -1.0)
+        for path, transform in self._iter_collection_raw_paths(
+                master_transform, paths, all_transforms):
             if _mpl_ge_2_0:
                 polygons = path.to_polygons(transform, closed_only=False)
             else:
                 polygons = path.to_polygons(transform)
             path_codes.append(polygons)
-        # Apply the styles and rgbFace to each one of the raw paths from
-        # the list. Additionally a transformation is being applied to
-        # translate each independent path
-        for xo, yo, path_poly, gc0, rgbFace in self._iter_collection(
-            gc, master_transform, all_transforms, path_codes, offsets,
-            offsetTrans, facecolors, edgecolors, linewidths, linestyles,
-            antialiaseds, urls, offset_position):
-            list_canvas_instruction = self.get_path_instructions(gc0, path_poly,
-                                    closed=True, rgbFace=rgbFace)
-            for widget, instructions in list_canvas_instruction:
-                widget.canvas.add(PushMatrix())
-                widget.canvas.add(Translate(xo, yo))
-                widget.canvas.add(instructions)
-                widget.canvas.add(PopMatrix())
+        fills = MeshBatch()
+        strokes = OrderedDict()
+        # kwargs holds hatchcolors, on versions of matplotlib that pass it
+        if _mpl_ge_3_3:
+            collection = self._iter_collection(
+                gc, path_codes, offsets, offsetTrans, facecolors, edgecolors,
+                linewidths, linestyles, antialiaseds, urls, offset_position,
+                **kwargs)
+        else:
+            collection = self._iter_collection(
+                gc, master_transform, all_transforms, path_codes, offsets,
+                offsetTrans, facecolors, edgecolors, linewidths, linestyles,
+                antialiaseds, urls, offset_position)
+        for xo, yo, path_poly, gc0, rgbFace in collection:
+            half_width = gc0.get_linewidth() / 2.
+            stroke_rgba = tuple(gc0.get_rgb())
+            for polygon in path_poly:
+                if len(polygon) < 2:
+                    continue
+                points = polygon + (xo, yo)
+                clip = self.handle_clip_rectangle(gc0, *points[-1])
+                target = self.clip_rectangles[clip] if clip > -1 else self.widget
+                points += (self.widget.x, self.widget.y)
+                if rgbFace is not None and len(points) > 2:
+                    triangles = fill_triangles(points.ravel().tolist())
+                    if triangles is not None:
+                        fills.add((target, tuple(rgbFace)), *triangles)
+                if half_width > 0 and stroke_rgba[3] > 0:
+                    key = (target, stroke_rgba, max(half_width, 0.5))
+                    strokes.setdefault(key, []).append(points)
+        for (target, rgba), vertices, indices in fills.meshes():
+            target.canvas.add(Color(*rgba))
+            target.canvas.add(Mesh(vertices=vertices, indices=indices,
+                                   mode=str("triangles")))
+        for (target, rgba, half_width), polylines in strokes.items():
+            target.canvas.add(Color(*rgba))
+            for vertices, indices in stroke_meshes(polylines, half_width):
+                target.canvas.add(Mesh(vertices=vertices, indices=indices,
+                                       mode=str("triangles")))
 
     def collides_with_existent_stencil(self, x, y):
         '''Check all the clipareas and returns the index of the clip area that
@@ -655,8 +823,27 @@ class RendererKivy(RendererBase):
         if ismath:
             self.draw_mathtext(gc, x, y, s, prop, angle)
         else:
+            texture = self.text_texture(s, prop, tuple(gc.get_rgb()))
+            with self.widget.canvas:
+                if isinstance(angle, float):
+                    PushMatrix()
+                    Rotate(angle=angle, origin=(int(x), int(y)))
+                    Rectangle(pos=(int(x), int(y)), texture=texture,
+                              size=texture.size)
+                    PopMatrix()
+                else:
+                    Rectangle(pos=(int(x), int(y)), texture=texture,
+                              size=texture.size)
+
+    def text_texture(self, s, prop, color):
+        '''Return the texture of the string s, drawn with the font properties
+           prop in color. Textures are cached, so repeated text is only laid
+           out and rasterised once.
+        '''
+        key = (s, font_key(prop), self.dpi, color)
+        texture = self.text_textures.get(key)
+        if texture is None:
             font = resource_find(prop.get_name() + ".ttf")
-            color = gc.get_rgb()
             if font is None:
                 plot_text = CoreLabel(font_size=prop.get_size_in_points(), color=color)
             else:
@@ -668,21 +855,27 @@ class RendererKivy(RendererBase):
             if self.weight_as_number(prop.get_weight()) > 500:
                 plot_text.bold = True
             plot_text.refresh()
-            with self.widget.canvas:
-                if isinstance(angle, float):
-                    PushMatrix()
-                    Rotate(angle=angle, origin=(int(x), int(y)))
-                    Rectangle(pos=(int(x), int(y)), texture=plot_text.texture,
-                              size=plot_text.texture.size)
-                    PopMatrix()
-                else:
-                    Rectangle(pos=(int(x), int(y)), texture=plot_text.texture,
-                              size=plot_text.texture.size)
+            texture = plot_text.texture
+            self.text_textures.put(key, texture)
+        return texture
 
     def draw_mathtext(self, gc, x, y, s, prop, angle):
         '''Draw the math text using matplotlib.mathtext. The position
            x,y is given in Kivy coordinates.
         '''
+        if _mpl_ge_3_6:
+            # agg gives only the coverage, which is coloured here
+            alpha = np.asarray(self.mathtext_parser.parse(s, self.dpi, prop).image)
+            h, w = alpha.shape
+            rgba = np.empty((h, w, 4), dtype=np.uint8)
+            rgba[..., :3] = np.multiply(gc.get_rgb()[:3], 255).astype(np.uint8)
+            rgba[..., 3] = alpha
+            texture = Texture.create(size=(w, h))
+            texture.blit_buffer(rgba.reshape(-1), colorfmt='rgba', bufferfmt='ubyte')
+            texture.flip_vertical()
+            with self.widget.canvas:
+                Rectangle(texture=texture, pos=(x, y), size=(w, h))
+            return
         ftimage, depth = self.mathtext_parser.parse(s, self.dpi, prop)
         w = ftimage.get_width()
         h = ftimage.get_height()
@@ -777,22 +970,33 @@ class RendererKivy(RendererBase):
     def get_text_width_height_descent(self, s, prop, ismath):
         '''This method is needed specifically to calculate text positioning
            in the canvas. Matplotlib needs the size to calculate the points
-           according to their layout
+           according to their layout. Results are cached on the string, the
+           font properties and the dpi.
         '''
-        if ismath:
+        key = (s, font_key(prop), self.dpi, ismath)
+        extents = self.text_extents.get(key)
+        if extents is not None:
+            return extents
+        if ismath and _mpl_ge_3_6:
+            parse = self.mathtext_parser.parse(s, self.dpi, prop)
+            extents = parse.width, parse.height, parse.depth
+        elif ismath:
             ftimage, depth = self.mathtext_parser.parse(s, self.dpi, prop)
             w = ftimage.get_width()
             h = ftimage.get_height()
-            return w, h, depth
-        font = resource_find(prop.get_name() + ".ttf")
-        if font is None:
-            plot_text = CoreLabel(font_size=prop.get_size_in_points())
+            extents = w, h, depth
         else:
-            plot_text = CoreLabel(font_size=prop.get_size_in_points(),
-                            font_name=prop.get_name())
-        plot_text.text = six.text_type("{}".format(s))
-        plot_text.refresh()
-        return plot_text.texture.size[0], plot_text.texture.size[1], 1
+            font = resource_find(prop.get_name() + ".ttf")
+            if font is None:
+                plot_text = CoreLabel(font_size=prop.get_size_in_points())
+            else:
+                plot_text = CoreLabel(font_size=prop.get_size_in_points(),
+                                font_name=prop.get_name())
+            plot_text.text = six.text_type("{}".format(s))
+            plot_text.refresh()
+            extents = plot_text.texture.size[0], plot_text.texture.size[1], 1
+        self.text_extents.put(key, extents)
+        return extents
 
     def new_gc(self):
         '''Instantiate a GraphicsContextKivy object
@@ -1084,14 +1288,24 @@ class TimerKivy(TimerBase):
 class FigureCanvasKivy(FocusBehavior, Widget, FigureCanvasBase):
     '''FigureCanvasKivy class. See module documentation for more information.
     '''
+    # position of the widget when the figure was last drawn, and the
+    # translation that moves that drawing to the current position
+    _drawn_pos = None
+    _pos_translate = None
 
     def __init__(self, figure, **kwargs):
+        self._resize_trigger = Clock.create_trigger(self._resize_figure)
         Window.bind(mouse_pos=self._on_mouse_pos)
         self.bind(size=self._on_size_changed)
         self.bind(pos=self._on_pos_changed)
         self.entered_figure = True
         self.figure = figure
         super(FigureCanvasKivy, self).__init__(figure=self.figure, **kwargs)
+        with self.canvas.before:
+            PushMatrix()
+            self._pos_translate = Translate(0, 0)
+        with self.canvas.after:
+            PopMatrix()
 
     def draw(self):
         '''Draw the figure using the KivyRenderer
@@ -1100,6 +1314,8 @@ class FigureCanvasKivy(FocusBehavior, Widget, FigureCanvasBase):
         self.canvas.clear()
         self._renderer = RendererKivy(self)
         self.figure.draw(self._renderer)
+        self._drawn_pos = tuple(self.pos)
+        self._on_pos_changed()
 
     def on_touch_down(self, touch):
         '''Kivy Event to trigger the following matplotlib events:
@@ -1218,9 +1434,21 @@ class FigureCanvasKivy(FocusBehavior, Widget, FigureCanvasBase):
         self.callbacks.process('figure_leave_event', event)
 
     def _on_pos_changed(self, *args):
-        self.draw()
+        '''Moving the widget does not change the figure, so rather than
+           redrawing it, the instructions from the last draw are translated.
+        '''
+        if self._drawn_pos is None or self._pos_translate is None:
+            return
+        self._pos_translate.xy = (self.x - self._drawn_pos[0],
+                                  self.y - self._drawn_pos[1])
 
     def _on_size_changed(self, *args):
+        '''Schedules a resize of the figure. All the size changes within a
+           frame are coalesced into a single redraw.
+        '''
+        self._resize_trigger()
+
+    def _resize_figure(self, *args):
         '''Changes the size of the matplotlib figure based on the size of the
            widget. The widget will change size according to the parent Layout
            size.
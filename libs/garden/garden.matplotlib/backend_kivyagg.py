@@ -170,47 +170,69 @@ class FigureCanvasKivyAgg(FigureCanvasKivy, FigureCanvasAgg):
 
     def __init__(self, figure, **kwargs):
         self.figure = figure
-        self.bind(size=self._on_size_changed)
         super(FigureCanvasKivyAgg, self).__init__(figure=self.figure, **kwargs)
         self.img_texture = None
         self.img_rect = None
+        self.bg_color = None
+        self.bg_rect = None
         self.blit()
 
     def draw(self):
         '''
-        Draw the figure using the agg renderer
+        Draw the figure using the agg renderer. The texture and the canvas
+        instructions are kept while the size of the figure is unchanged, and
+        the renderer buffer is uploaded without an intermediate copy. If a
+        blitbox has been set, only that region of the texture is updated.
         '''
-        self.canvas.clear()
         FigureCanvasAgg.draw(self)
-        if self.blitbox is None:
-            l, b, w, h = self.figure.bbox.bounds
-            w, h = int(w), int(h)
-            buf_rgba = self.get_renderer().buffer_rgba()
+        l, b, w, h = self.figure.bbox.bounds
+        w, h = int(w), int(h)
+        new_texture = self._ensure_texture(w, h)
+        self.bg_color.rgba = self.figure.get_facecolor()
+        if self.blitbox is None or new_texture:
+            # blit_buffer needs a flat buffer, and cast gives one without copying the pixels
+            self.img_texture.blit_buffer(memoryview(self.get_renderer().buffer_rgba()).cast('B'),
+                                         colorfmt='rgba', bufferfmt='ubyte')
         else:
             bbox = self.blitbox
             l, b, r, t = bbox.extents
-            w = int(r) - int(l)
-            h = int(t) - int(b)
-            t = int(b) + h
             reg = self.copy_from_bbox(bbox)
-            buf_rgba = reg.to_string()
+            try:
+                buf_rgba = memoryview(reg).cast('B')
+            except TypeError:
+                # older versions of matplotlib do not expose the buffer
+                buf_rgba = reg.to_string()
+            # the texture is flipped, so its rows run from the top of the figure
+            self.img_texture.blit_buffer(buf_rgba, size=(int(r) - int(l), int(t) - int(b)),
+                                         pos=(int(l), h - int(t)),
+                                         colorfmt='rgba', bufferfmt='ubyte')
+        self.canvas.ask_update()
+
+    def _ensure_texture(self, w, h):
+        '''Create the texture and the canvas instructions that display it, if
+           there are none of the right size. Returns whether new ones were
+           created.
+        '''
+        if self.img_texture is not None and self.img_texture.size == (w, h):
+            return False
+        self.canvas.clear()
         texture = Texture.create(size=(w, h))
         texture.flip_vertical()
-        color = self.figure.get_facecolor()
         with self.canvas:
-            Color(*color)
-            Rectangle(pos=self.pos, size=(w, h))
+            self.bg_color = Color(*self.figure.get_facecolor())
+            self.bg_rect = Rectangle(pos=self.pos, size=(w, h))
             Color(1.0, 1.0, 1.0, 1.0)
             self.img_rect = Rectangle(texture=texture, pos=self.pos,
                                       size=(w, h))
-        texture.blit_buffer(bytes(buf_rgba), colorfmt='rgba', bufferfmt='ubyte')
         self.img_texture = texture
+        return True
 
     filetypes = FigureCanvasKivy.filetypes.copy()
     filetypes['png'] = 'Portable Network Graphics'
 
     def _on_pos_changed(self, *args):
         if self.img_rect is not None:
+            self.bg_rect.pos = self.pos
             self.img_rect.pos = self.pos
 
     def _print_image(self, filename, *args, **kwargs):
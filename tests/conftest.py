@@ -0,0 +1,4 @@
+import os
+
+# kivy would otherwise parse pytest's command line arguments
+os.environ.setdefault('KIVY_NO_ARGS', '1')
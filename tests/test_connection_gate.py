@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from energyhub.connection_gate import ConnectionGate
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def test_held_work_cannot_be_cancelled_once_running(executor):
+    gate = ConnectionGate(executor)
+    gate.close()
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    future = gate.submit(work)
+    gate.open()
+    assert started.wait(5)
+    assert not future.cancel()
+    assert future.running()
+    release.set()
+    assert future.result(5) == 'done'
+
+
+def test_held_work_queued_in_the_executor_is_cancelled(executor):
+    gate = ConnectionGate(executor)
+    release = threading.Event()
+    blocker = executor.submit(release.wait, 5)
+    gate.close()
+    calls = []
+    future = gate.submit(calls.append, 'called')
+    gate.open()
+    assert future.cancel()
+    assert future.cancelled()
+    release.set()
+    blocker.result(5)
+    executor.shutdown()
+    assert calls == []
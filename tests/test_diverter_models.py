@@ -0,0 +1,21 @@
+import numpy as np
+
+from energyhub.models.diverter_models import decode_minute_data, minute_columns_to_arrays
+
+
+def test_minutes_without_voltage_are_dropped():
+    minute_data = [{'yr': 2024, 'mon': 1, 'dom': 1, 'v1': 2400, 'imp': 600},
+                   {'yr': 2024, 'mon': 1, 'dom': 1, 'min': 1, 'imp': 600},
+                   {'yr': 2024, 'mon': 1, 'dom': 1, 'min': 2, 'v1': 2400, 'h1d': 1200},
+                   ]
+    timestamps, powers = minute_columns_to_arrays(decode_minute_data(minute_data))
+    np.testing.assert_array_equal(timestamps.total_hours(), [0, 2 / 60])
+    np.testing.assert_allclose(powers['import_power'], [10, 0])
+    np.testing.assert_allclose(powers['diverted_power'], [0, 20])
+    assert np.isfinite(powers['total_power']).all()
+
+
+def test_no_minute_data():
+    timestamps, powers = minute_columns_to_arrays(decode_minute_data([]))
+    assert timestamps.size == 0
+    assert powers['total_power'].size == 0
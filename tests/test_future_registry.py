@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from energyhub.future_registry import FutureRegistry
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def test_grouped_keys_keep_only_their_latest_future(executor):
+    registry = FutureRegistry(executor, max_completed=2, group=lambda key: None if key[0] == 'history' else key[0])
+    for i in range(50):
+        registry.submit(('_check', (i,)), lambda: i).result()
+        registry.submit(('history', (i,)), lambda: i).result()
+    registry.submit(('_refresh', ()), lambda: 'refreshed').result()
+    registry.get()  # evicts again, now that the last future has completed
+    assert registry.stats['size'] <= 2 + 2
+    assert registry.get(('_check', (49,))) is not None
+    assert registry.get(('_check', (48,))) is None
+    assert registry.get(('_refresh', ())).result() == 'refreshed'
+
+
+def test_latest_of_a_group_outlives_max_age(executor):
+    registry = FutureRegistry(executor, max_completed=0, max_age=0, group=lambda key: key[0])
+    registry.submit(('_refresh', ()), lambda: 'refreshed').result()
+    registry.submit(('_other', ()), lambda: None).result()
+    assert registry.get(('_refresh', ())).result() == 'refreshed'
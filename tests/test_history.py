@@ -0,0 +1,14 @@
+import pytest
+
+# the history graphs use the plotting of the EcoforestClient submodule
+pytest.importorskip('ecoforest')
+
+from energyhub.history import ALL_SOURCES, PRODUCTION_SOURCES, drawn_sources, graph_sources  # noqa: E402
+
+
+def test_energy_graph_waits_for_its_consumer_bar_only_when_every_consumer_is_expected():
+    assert drawn_sources('energy', PRODUCTION_SOURCES) == PRODUCTION_SOURCES
+    assert drawn_sources('energy', ALL_SOURCES) == graph_sources('energy')
+    without_heat_pump = ALL_SOURCES - {'heat_pump'}
+    assert graph_sources('energy', without_heat_pump) == PRODUCTION_SOURCES
+    assert drawn_sources('energy', without_heat_pump, without_heat_pump) == PRODUCTION_SOURCES
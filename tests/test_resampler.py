@@ -0,0 +1,41 @@
+import datetime
+import zoneinfo
+
+import numpy as np
+import pytest
+
+from energyhub.utils import Resampler, TimestampArray
+
+
+@pytest.fixture
+def ref_ts():
+    return TimestampArray.from_components(2024, 1, 1, [0, 1, 2])
+
+
+def test_resample_mean(ref_ts):
+    data_ts = TimestampArray.from_components(2024, 1, 1, [0, 0, 1], [10, 40, 30])
+    resampled = Resampler(ref_ts, data_ts).resample(np.array([1., 3., 5.]))
+    np.testing.assert_array_equal(resampled, [2., 5., 0.])
+
+
+@pytest.mark.parametrize('how', Resampler.AGGREGATIONS)
+def test_resample_empty_day_gives_fill(ref_ts, how):
+    resampler = Resampler(ref_ts, TimestampArray.from_epoch([]))
+    np.testing.assert_array_equal(resampler.resample(np.array([]), how=how, fill=np.nan), [np.nan] * 3)
+    np.testing.assert_array_equal(resampler.resample(np.empty((2, 0)), how=how), np.zeros((2, 3)))
+    np.testing.assert_array_equal(resampler.resample(np.array([]), how=how, fill='previous'), [0., 0., 0.])
+
+
+@pytest.mark.parametrize('date, n_hours', [(datetime.date(2024, 3, 31), 23),
+                                           (datetime.date(2024, 10, 27), 25),
+                                           (datetime.date(2024, 6, 1), 24)])
+def test_day_slice_covers_each_hour_of_a_dst_day(date, n_hours):
+    london = zoneinfo.ZoneInfo('Europe/London')
+    midnight = datetime.datetime.combine(date, datetime.time(0), london).timestamp()
+    # half-hourly samples from 6 hours before the day to 6 hours after it
+    seconds = np.arange(midnight - 6 * 3600, midnight + (n_hours + 6) * 3600, 1800)
+    timestamps = TimestampArray.from_epoch(seconds, tz=london)
+    day = timestamps.day_slice(date)
+    assert day.stop - day.start == n_hours * 2
+    np.testing.assert_array_equal(seconds[day][[0, -1]], [midnight, midnight + (n_hours * 2 - 1) * 1800])
+    assert timestamps[day].total_hours()[-1] == 23.5
@@ -0,0 +1,34 @@
+import datetime
+
+import numpy as np
+
+from energyhub.sample_log import SampleLog
+
+DTYPE = np.dtype([('time', '<i8'), ('level', '<f4')])
+
+
+def day_start(date: datetime.date) -> int:
+    return int(datetime.datetime.combine(date, datetime.time(0)).timestamp())
+
+
+def test_samples_are_read_by_day(tmp_path):
+    log = SampleLog(str(tmp_path / 'samples.bin'), DTYPE)
+    start = day_start(datetime.date(2024, 1, 2))
+    for time, level in ((start - 60, 1), (start, 2), (start + 3600, 3), (start + 86400, 4)):
+        assert log.append({'time': time, 'level': level})
+    assert not log.append({'time': start, 'level': 5})
+    np.testing.assert_array_equal(log.read_date(datetime.date(2024, 1, 2))['level'], [2, 3])
+
+
+def test_partial_record_is_dropped_before_appending(tmp_path):
+    path = tmp_path / 'samples.bin'
+    start = day_start(datetime.date(2024, 1, 2))
+    SampleLog(str(path), DTYPE).append({'time': start, 'level': 1})
+    with open(path, 'ab') as file:
+        file.write(b'\x01\x02\x03')
+    log = SampleLog(str(path), DTYPE)
+    assert log.last_time == start
+    assert log.append({'time': start + 60, 'level': 2})
+    reopened = SampleLog(str(path), DTYPE)
+    np.testing.assert_array_equal(reopened.read()['time'], [start, start + 60])
+    assert reopened.last_time == start + 60
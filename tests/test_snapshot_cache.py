@@ -0,0 +1,25 @@
+import datetime
+
+import numpy as np
+
+from energyhub.snapshot_cache import SnapshotCache
+
+IMAGE = np.zeros((4, 4, 4), dtype=np.uint8)
+
+
+def test_closed_days_are_written_when_added(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    cache.put(datetime.date(2024, 1, 1), 'energy', (4, 4), 100, IMAGE)
+    cache._writer.shutdown(wait=True)
+    assert SnapshotCache(str(tmp_path)).get(datetime.date(2024, 1, 1), 'energy', (4, 4), 100) is not None
+
+
+def test_open_days_from_before_an_invalidation_are_not_added(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    today = datetime.date.today()
+    generation = cache.generation
+    cache.invalidate_open()
+    cache.put(today, 'energy', (4, 4), 100, IMAGE, generation)
+    assert cache.get(today, 'energy', (4, 4), 100) is None
+    cache.put(today, 'energy', (4, 4), 100, IMAGE, cache.generation)
+    assert cache.get(today, 'energy', (4, 4), 100) is not None
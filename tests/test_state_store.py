@@ -0,0 +1,27 @@
+import json
+
+from kivy.clock import Clock
+
+from energyhub.models.car_models import JLRCarModel
+from energyhub.state_store import StateStore
+
+STATUS = {'lastUpdatedTime': '2024-01-01T12:00:00+0000',
+          'vehicleStatus': {'evStatus': [{'key': 'EV_STATE_OF_CHARGE', 'value': '80'},
+                                         {'key': 'EV_CHARGING_STATUS', 'value': 'NOTCONNECTED'},
+                                         {'key': 'EV_RANGE_ON_BATTERY_KM', 'value': '160.9344'},
+                                         {'key': 'EV_CHARGING_RATE_KM_PER_HOUR', 'value': '0'},
+                                         {'key': 'EV_CHARGING_RATE_SOC_PER_HOUR', 'value': '0'},
+                                         ]}}
+
+
+def test_saved_state_has_the_refreshed_values(tmp_path):
+    path = tmp_path / 'state.json'
+    model = JLRCarModel('user', 'password', state_store=StateStore(str(path)))
+    model.update_properties(STATUS)
+    Clock.tick()
+    saved = json.loads(path.read_text())['JLRCarModel']
+    assert saved['properties']['car_battery_level'] == 80
+    restored = JLRCarModel('user', 'password', state_store=StateStore(str(path)))
+    assert restored.car_battery_level == 80
+    assert restored.car_range == model.car_range
+    assert restored.refreshed_at == saved['refreshed_at']